@@ -0,0 +1,120 @@
+"""Concurrent crawling of import graphs on high-latency filesystems.
+
+DependencyGraph.add_file_recursive reads and resolves one file at a time, so on
+NFS or FUSE mounts the crawl mostly waits on filesystem round trips. The crawl
+here runs get_file_deps for many files at once in a bounded thread pool,
+driven by an asyncio event loop. A file's dependencies are scheduled as soon as
+it has been resolved, so parsing and resolution of one file overlap with the
+I/O of others.
+
+All graph mutations happen on the event loop thread; get_file_deps runs on the
+worker threads, so graphs crawled here must make it thread-safe (as
+ImportGraph does). The resulting graph has the same nodes, edges, broken
+dependencies, unreadable and non-source files and provenance as a serial
+crawl. Under a CrawlBudget, files finish in no particular order, so a file
+first reached along a longer path is crawled again if a shorter one turns up
+later (see DependencyGraph.follow_file). The files truncated by max_depth are
+then the same as in a serial crawl; those truncated by max_files and
+max_seconds depend on timing, as they depend on order in a serial crawl.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+
+from . import graph
+from . import parsepy
+from . import resolve
+
+
+async def crawl(import_graph, filenames, trim=False, max_workers=32):
+    """Add files and their recursive dependencies to a graph concurrently.
+
+    Equivalent to calling import_graph.add_file_recursive for each file.
+
+    Args:
+      import_graph: An unbuilt DependencyGraph.
+      filenames: An iterable of source filenames, as stored in the graph.
+      trim: Whether to trim the dependencies of builtin and system files.
+      max_workers: The maximum number of files read at once.
+    """
+    assert not import_graph.final, 'Trying to mutate a final graph.'
+    loop = asyncio.get_running_loop()
+    budget = import_graph.budget
+    if budget is not None:
+        budget.start()
+    # Running tasks, mapped to the file and its depth from a source.
+    pending = {}
+
+    def schedule(filename, depth):
+        import_graph.graph.add_node(filename)
+        if not resolve.is_source_path(filename):
+            import_graph.non_source_files.add(filename)
+            return
+        if budget is not None:
+            visited = import_graph.visit_depth(filename, depth) is not None
+            if visited and filename not in import_graph.truncated:
+                # Read (or being read) from a deeper point; its dependencies
+                # are crawled at the new depth.
+                follow(import_graph.graph.successors(filename), depth + 1)
+                return
+            if not budget.allows(depth):
+                import_graph.truncated.add(filename)
+                return
+            budget.files += 1
+            import_graph.truncated.discard(filename)
+        task = loop.run_in_executor(
+            executor, import_graph.get_file_deps, filename)
+        pending[task] = (filename, depth)
+
+    def follow(deps, depth):
+        # Files are added to the graph as soon as they are scheduled, so the
+        # graph stands in for the `seen` set of DependencyGraph.crawl.
+        for f in list(deps):
+            if import_graph.follow_file(f, (), trim, depth):
+                schedule(f, depth)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        for filename in filenames:
+            import_graph.add_source_file(filename)
+            if budget is not None or filename not in import_graph.graph.nodes:
+                schedule(filename, 0)
+        while pending:
+            done, _ = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                filename, depth = pending.pop(task)
+                try:
+                    deps, broken = task.result()
+                except parsepy.ParseError:
+                    import_graph.add_unreadable_file(filename)
+                    continue
+                if budget is not None:
+                    # The file may have been reached along a shorter path
+                    # while it was being read.
+                    depth = import_graph.visit_depth(filename, depth)
+                follow(deps, depth + 1)
+                import_graph.add_file_deps(filename, deps, broken)
+
+
+def create(env, filenames, trim=False, max_workers=32, **kwargs):
+    """Create and return a final graph, crawling files concurrently.
+
+    Args:
+      env: An environment.Environment object
+      filenames: An iterable of filenames
+      trim: Whether to trim the dependencies of builtin and system files.
+      max_workers: The maximum number of files read at once.
+      **kwargs: Other options for graph.ImportGraph.
+
+    Returns:
+      An immutable ImportGraph, equivalent to graph.ImportGraph.create().
+    """
+    import_graph = graph.ImportGraph(env, **kwargs)
+    if kwargs.get('collapse_system'):
+        trim = True
+    filenames = [os.path.abspath(f) for f in filenames]
+    with import_graph.tracer.span('crawl', 'graph', workers=max_workers):
+        asyncio.run(crawl(import_graph, filenames, trim, max_workers))
+    import_graph.build()
+    return import_graph
@@ -0,0 +1,107 @@
+"""Weighted critical-path analysis of a built dependency graph.
+
+If every node of the condensed graph (a file or a NodeSet) is processed only
+after its dependencies, e.g. by a type checker, and node n takes weight(n),
+then with unlimited parallelism the whole graph takes as long as its heaviest
+chain of dependencies: the critical path. The slack of a node is how much
+longer it could take without delaying the whole graph, so nodes with no slack
+are the ones worth speeding up, and import cycles with a large weight and no
+slack are the ones worth breaking.
+
+Weights are a dict of file path to cost, in any unit; a NodeSet costs the sum
+of its files.
+"""
+
+import os
+
+from . import graph
+from . import utils
+
+nx = utils.LazyModule('networkx')
+
+
+def file_size_weights(dependency_graph):
+    """Estimate costs by file size in bytes."""
+    weights = {}
+    for node in dependency_graph.graph.nodes:
+        for f in (node if isinstance(node, graph.NodeSet) else [node]):
+            try:
+                weights[f] = os.path.getsize(f)
+            except OSError:
+                weights[f] = 0
+    return weights
+
+
+def parse_time_weights(import_graph):
+    """Use the time importlab spent parsing each file, in seconds.
+
+    A file whose imports were reused from an identical file costs as much as
+    the parse of that file. Files whose imports were read from a manifest
+    were not parsed, and cost nothing.
+    """
+    return dict(import_graph.parse_times)
+
+
+def node_weight(node, weights):
+    """The weight of a file or NodeSet; missing files weigh nothing."""
+    if isinstance(node, graph.NodeSet):
+        return sum(weights.get(f, 0) for f in node)
+    return weights.get(node, 0)
+
+
+class CriticalPath(object):
+    """The critical path and slack of every node of a final DependencyGraph.
+
+    Attributes:
+      weight: node -> weight.
+      finish: node -> the earliest time the node can finish, i.e. the weight of
+        the heaviest chain of dependencies ending with the node.
+      slack: node -> how much the node can be delayed without delaying the
+        makespan.
+      makespan: The time to process the whole graph.
+      path: The critical path, dependencies first.
+    """
+
+    def __init__(self, dependency_graph, weights):
+        assert dependency_graph.final, (
+            'Call build() before analysing the graph.')
+        g = dependency_graph.graph
+        # Importers come before their dependencies in topological order.
+        order = list(nx.topological_sort(g))
+        self.weight = {node: node_weight(node, weights) for node in order}
+        self.finish = {}
+        for node in reversed(order):
+            self.finish[node] = self.weight[node] + max(
+                (self.finish[d] for d in g.successors(node)), default=0)
+        self.makespan = max(self.finish.values(), default=0)
+        # The latest time each node can finish; its importers must start by
+        # then.
+        latest = {}
+        for node in order:
+            latest[node] = min(
+                (latest[k] - self.weight[k] for k in g.predecessors(node)),
+                default=self.makespan)
+        self.slack = {node: latest[node] - self.finish[node] for node in order}
+        self.path = []
+        node = max(order, key=self.finish.get, default=None)
+        while node is not None:
+            self.path.append(node)
+            node = max(g.successors(node), key=self.finish.get, default=None)
+        self.path.reverse()
+
+    def top_cycles(self, n=None):
+        """The import cycles that contribute most to the makespan.
+
+        Cycles are ranked by weight minus slack: cycles on the critical path by
+        their weight, followed by cycles that would join it if they grew.
+
+        Args:
+          n: The maximum number of cycles to return.
+
+        Returns:
+          A list of NodeSets.
+        """
+        cycles = [node for node in self.weight
+                  if isinstance(node, graph.NodeSet)]
+        cycles.sort(key=lambda c: (self.slack[c] - self.weight[c], c.nodes))
+        return cycles[:n]
@@ -0,0 +1,386 @@
+"""Persist import graphs in a SQLite database.
+
+The database lets other tools query dependencies with SQL, and can be refreshed
+incrementally by re-scanning only the files that changed.
+
+Tables:
+  files: One row per file in the graph, with columns
+    id, path, kind (the resolve.ResolvedFile class name), module_name,
+    fs_index (see resolve.dump_provenance), is_source, parsed (whether the
+    file's imports were read), unreadable, mtime_ns, size.
+    mtime_ns and size are only recorded for parsed and unreadable files.
+  imports: One row per import statement of a parsed file, with columns
+    file_id, name, new_name, is_from, is_star, source (the parsepy.
+    ImportStatement fields) and resolved_id, the id of the imported file or
+    NULL if the import was not resolved.
+  deps: A view of distinct (importer, imported) path pairs.
+  meta: Options the database was built with.
+
+Both imports.file_id and imports.resolved_id are indexed, for forward and
+reverse dependency lookups.
+"""
+
+import collections
+import os
+import sqlite3
+
+from . import graph
+from . import resolve
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+DROP VIEW IF EXISTS deps;
+DROP TABLE IF EXISTS imports;
+DROP TABLE IF EXISTS files;
+DROP TABLE IF EXISTS meta;
+CREATE TABLE meta (
+  key TEXT PRIMARY KEY,
+  value TEXT
+);
+CREATE TABLE files (
+  id INTEGER PRIMARY KEY,
+  path TEXT NOT NULL UNIQUE,
+  kind TEXT NOT NULL,
+  module_name TEXT,
+  fs_index INTEGER,
+  is_source INTEGER NOT NULL DEFAULT 0,
+  parsed INTEGER NOT NULL DEFAULT 0,
+  unreadable INTEGER NOT NULL DEFAULT 0,
+  mtime_ns INTEGER,
+  size INTEGER
+);
+CREATE TABLE imports (
+  file_id INTEGER NOT NULL REFERENCES files(id),
+  name TEXT NOT NULL,
+  new_name TEXT,
+  is_from INTEGER NOT NULL,
+  is_star INTEGER NOT NULL,
+  source TEXT,
+  resolved_id INTEGER REFERENCES files(id)
+);
+CREATE VIEW deps AS
+  SELECT DISTINCT f.path AS importer, t.path AS imported
+  FROM imports i
+  JOIN files f ON f.id = i.file_id
+  JOIN files t ON t.id = i.resolved_id;
+"""
+
+# Created after the initial bulk insert, which is much faster than maintaining
+# them row by row.
+_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS imports_file_id ON imports(file_id)',
+    'CREATE INDEX IF NOT EXISTS imports_resolved_id ON imports(resolved_id)',
+)
+
+# The number of paths to look up per query, below SQLite's default limit of
+# 999 parameters.
+_BATCH_SIZE = 500
+
+# The files under the candidates in _orphans that no source file leads to,
+# e.g. dependencies that a changed file no longer imports. Only the subgraph
+# below the candidates is searched: a file in it is live if it is a source or
+# is imported from outside it, and so is everything a live file imports.
+_ORPHANS = """
+WITH RECURSIVE
+  below(id) AS (
+    SELECT id FROM _orphans
+    UNION
+    SELECT i.resolved_id FROM imports i JOIN below ON i.file_id = below.id
+    WHERE i.resolved_id IS NOT NULL
+  ),
+  live(id) AS (
+    SELECT f.id FROM files f JOIN below ON f.id = below.id
+    WHERE f.is_source OR EXISTS (
+      SELECT 1 FROM imports i
+      WHERE i.resolved_id = f.id AND i.file_id NOT IN below)
+    UNION
+    SELECT i.resolved_id FROM imports i JOIN live ON i.file_id = live.id
+    WHERE i.resolved_id IN below
+  )
+SELECT id FROM below WHERE id NOT IN live
+"""
+
+# Parsed and unreadable files: update everything.
+_UPSERT_TRACKED = """
+INSERT INTO files (path, kind, module_name, fs_index, is_source, parsed,
+                   unreadable, mtime_ns, size)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(path) DO UPDATE SET
+  kind = excluded.kind, module_name = excluded.module_name,
+  fs_index = excluded.fs_index,
+  is_source = max(is_source, excluded.is_source),
+  parsed = excluded.parsed, unreadable = excluded.unreadable,
+  mtime_ns = excluded.mtime_ns, size = excluded.size
+"""
+
+# Files that were only seen as dependencies: keep what we know about them.
+_UPSERT_DEP = """
+INSERT INTO files (path, kind, module_name, fs_index, is_source)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(path) DO UPDATE SET
+  kind = excluded.kind, module_name = excluded.module_name,
+  fs_index = excluded.fs_index,
+  is_source = max(is_source, excluded.is_source)
+"""
+
+
+class DatabaseError(Exception):
+    pass
+
+
+class _RecordingImportGraph(graph.ImportGraph):
+    """An ImportGraph that keeps the resolved imports of every parsed file.
+
+    Files in `known` are already in the database and are not crawled.
+    """
+
+    def __init__(self, env, known=(), **kwargs):
+        super(_RecordingImportGraph, self).__init__(env, **kwargs)
+        self.known = set(known)
+        # file path -> [(ImportStatement, resolved full path or None)]
+        self.file_imports = {}
+
+    def follow_file(self, f, seen, trim, depth=None):
+        return (f not in self.known and
+                super(_RecordingImportGraph, self).follow_file(
+                    f, seen, trim, depth))
+
+    def resolve_file_imports(self, filename):
+        out = super(_RecordingImportGraph, self).resolve_file_imports(filename)
+        self.file_imports[filename] = out
+        return out
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def connect(db_path):
+    """Open a database written by create()."""
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    return conn
+
+
+def _write_graph(conn, import_graph):
+    """Upsert the files and imports recorded by a _RecordingImportGraph."""
+    fs_path = import_graph.env.path
+    tracked = []
+    deps = []
+    for path in import_graph.graph.nodes:
+        kind, _, module_name, fs_index = resolve.dump_provenance(
+            import_graph.provenance[path], fs_path)
+        is_source = int(path in import_graph.sources)
+        parsed = path in import_graph.file_imports
+        unreadable = path in import_graph.unreadable_files
+        if parsed or unreadable:
+            mtime_ns, size = _stat(path) or (None, None)
+            tracked.append((path, kind, module_name, fs_index, is_source,
+                            int(parsed), int(unreadable), mtime_ns, size))
+        else:
+            deps.append((path, kind, module_name, fs_index, is_source))
+    conn.executemany(_UPSERT_TRACKED, tracked)
+    conn.executemany(_UPSERT_DEP, deps)
+    paths = set(import_graph.file_imports)
+    for imports in import_graph.file_imports.values():
+        paths.update(resolved for _, resolved in imports if resolved)
+    ids = _file_ids(conn, paths)
+    rows = (
+        (ids[path], imp.name, imp.new_name, int(imp.is_from),
+         int(imp.is_star), imp.source, ids.get(resolved) if resolved else None)
+        for path, imports in import_graph.file_imports.items()
+        for imp, resolved in imports)
+    conn.executemany(
+        'INSERT INTO imports VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+
+def _file_ids(conn, paths):
+    """Look up the ids of some files, in batches."""
+    paths = sorted(paths)
+    ids = {}
+    for i in range(0, len(paths), _BATCH_SIZE):
+        batch = paths[i:i + _BATCH_SIZE]
+        ids.update(conn.execute(
+            'SELECT path, id FROM files WHERE path IN (%s)' %
+            ', '.join('?' * len(batch)), batch))
+    return ids
+
+
+def _delete_orphans(conn, candidates):
+    """Delete the files under some candidates that no source file leads to.
+
+    Returns:
+      The number of files deleted.
+    """
+    conn.execute('CREATE TEMP TABLE _orphans (id INTEGER PRIMARY KEY)')
+    try:
+        conn.executemany('INSERT OR IGNORE INTO _orphans VALUES (?)',
+                         [(i,) for i in candidates])
+        orphans = [(i,) for (i,) in conn.execute(_ORPHANS)]
+    finally:
+        conn.execute('DROP TABLE _orphans')
+    conn.executemany('DELETE FROM imports WHERE file_id = ?', orphans)
+    conn.executemany('DELETE FROM files WHERE id = ?', orphans)
+    return len(orphans)
+
+
+def create(db_path, env, filenames, trim=False, **kwargs):
+    """Crawl source files and write the results to a database.
+
+    Any existing importlab tables in the database are replaced.
+
+    Args:
+      db_path: The database file.
+      env: An environment.Environment object
+      filenames: An iterable of filenames
+      trim: Whether to trim the dependencies of builtin and system files.
+      **kwargs: Other options for graph.ImportGraph.
+
+    Returns:
+      The final ImportGraph.
+    """
+    import_graph = _RecordingImportGraph(env, **kwargs)
+    if kwargs.get('collapse_system'):
+        trim = True
+    for filename in filenames:
+        import_graph.add_file_recursive(os.path.abspath(filename), trim)
+    conn = connect(db_path)
+    try:
+        with conn:
+            # executescript() commits any open transaction before running, so
+            # open one in the script to write the schema and data atomically.
+            conn.executescript('BEGIN;' + _SCHEMA)
+            conn.executemany('INSERT INTO meta VALUES (?, ?)', [
+                ('schema_version', str(SCHEMA_VERSION)),
+                ('python_version', '%d.%d' % tuple(env.python_version[:2])),
+                ('trim', str(int(trim))),
+                ('collapse_system',
+                 str(int(bool(kwargs.get('collapse_system'))))),
+            ])
+            _write_graph(conn, import_graph)
+            for statement in _INDEXES:
+                conn.execute(statement)
+    finally:
+        conn.close()
+    import_graph.build()
+    return import_graph
+
+
+def refresh(db_path, env, **kwargs):
+    """Re-scan the files in a database whose mtime or size changed.
+
+    Changed files are re-parsed and re-resolved, files they newly import are
+    crawled, importers of deleted files are re-resolved, and files that are no
+    longer reachable from a source file are removed. The imports of
+    other files are not re-resolved, so e.g. a new module that would shadow an
+    existing resolution is only picked up once its importer changes.
+
+    Args:
+      db_path: The database file.
+      env: An environment.Environment object, with the same path as the one
+        used to create the database.
+      **kwargs: Other options for graph.ImportGraph. The trim and
+        collapse_system options the database was created with are always
+        used.
+
+    Returns:
+      A collections.Counter with the numbers of 'changed', 'deleted',
+      'reresolved', 'added' and 'removed' files.
+    """
+    conn = connect(db_path)
+    try:
+        meta = dict(conn.execute('SELECT key, value FROM meta'))
+        if meta.get('schema_version') != str(SCHEMA_VERSION):
+            raise DatabaseError('Unsupported database schema in %s' % db_path)
+        python_version = '%d.%d' % tuple(env.python_version[:2])
+        if meta['python_version'] != python_version:
+            raise DatabaseError('Database %s was built for python %s' % (
+                db_path, meta['python_version']))
+        trim = meta['trim'] == '1'
+        kwargs['collapse_system'] = meta.get('collapse_system') == '1'
+        stats = collections.Counter()
+        columns = 'id, path, kind, module_name, fs_index, is_source'
+        changed = {}
+        deleted = {}
+        query = ('SELECT %s, mtime_ns, size FROM files '
+                 'WHERE parsed OR unreadable' % columns)
+        for row in conn.execute(query):
+            st = _stat(row[1])
+            if st is None:
+                deleted[row[0]] = row[:6]
+            elif st != tuple(row[6:]):
+                changed[row[0]] = row[:6]
+        stats['changed'] = len(changed)
+        stats['deleted'] = len(deleted)
+        # Files that imported a deleted file need to be resolved again.
+        for file_id in deleted:
+            query = ('SELECT DISTINCT %s FROM files WHERE id IN '
+                     '(SELECT file_id FROM imports WHERE resolved_id = ?)' %
+                     ', '.join('files.' + c for c in columns.split(', ')))
+            for row in conn.execute(query, (file_id,)):
+                if row[0] not in changed and row[0] not in deleted:
+                    changed[row[0]] = row
+                    stats['reresolved'] += 1
+        known = {path for (path,) in conn.execute('SELECT path FROM files')}
+        old = set(known)
+        for row in changed.values():
+            known.discard(row[1])
+        for row in deleted.values():
+            known.discard(row[1])
+        import_graph = _RecordingImportGraph(env, known=known, **kwargs)
+        # Unchanged source files that a changed file imports must keep their
+        # Direct provenance and is_source flag.
+        query = ('SELECT path, kind, module_name, fs_index FROM files '
+                 'WHERE is_source')
+        for path, kind, module_name, fs_index in conn.execute(query):
+            import_graph.provenance[path] = resolve.load_provenance(
+                [kind, path, module_name, fs_index], env.path)
+            import_graph.sources.add(path)
+        for _, path, kind, module_name, fs_index, _ in changed.values():
+            import_graph.provenance[path] = resolve.load_provenance(
+                [kind, path, module_name, fs_index], env.path)
+            import_graph.crawl(path, trim)
+        stats['added'] = len(set(import_graph.graph.nodes) - old)
+        with conn:
+            stale = [(i,) for i in list(changed) + list(deleted)]
+            # Files that the stale imports led to may no longer be reachable.
+            candidates = set()
+            for (file_id,) in stale:
+                candidates.update(r for (r,) in conn.execute(
+                    'SELECT resolved_id FROM imports '
+                    'WHERE file_id = ? AND resolved_id IS NOT NULL',
+                    (file_id,)))
+            conn.executemany('DELETE FROM imports WHERE file_id = ?', stale)
+            conn.executemany('DELETE FROM files WHERE id = ?',
+                             [(i,) for i in deleted])
+            _write_graph(conn, import_graph)
+            candidates.difference_update(deleted)
+            if candidates:
+                stats['removed'] = _delete_orphans(conn, candidates)
+    finally:
+        conn.close()
+    return stats
+
+
+def get_deps(conn, path):
+    """Return the sorted paths of the files that `path` imports."""
+    return [p for (p,) in conn.execute(
+        'SELECT DISTINCT t.path FROM files f '
+        'JOIN imports i ON i.file_id = f.id '
+        'JOIN files t ON t.id = i.resolved_id '
+        'WHERE f.path = ? ORDER BY t.path', (path,))]
+
+
+def get_importers(conn, path):
+    """Return the sorted paths of the files that import `path`."""
+    return [p for (p,) in conn.execute(
+        'SELECT DISTINCT f.path FROM files t '
+        'JOIN imports i ON i.resolved_id = t.id '
+        'JOIN files f ON f.id = i.file_id '
+        'WHERE t.path = ? ORDER BY f.path', (path,))]
@@ -2,13 +2,83 @@ import abc
 import glob
 import os
 import tarfile
-import tempfile
+import time
 
 
 class FileSystemError(Exception):
     pass
 
 
+# Map of device id (st_dev) to whether that filesystem is case insensitive.
+_case_insensitive_devices = {}
+
+
+def _probe_case_insensitive(path, dev):
+    """Check case sensitivity by looking up existing names with swapped case.
+
+    Args:
+      path: An existing directory.
+      dev: The device id of `path`.
+
+    Returns:
+      True or False, or None if no suitable name was found on the device.
+    """
+    # Name lookups are answered by the filesystem of the containing directory,
+    # so only consider names whose parent directory lives on the same device.
+    candidates = []
+    d = path
+    while True:
+        parent, name = os.path.split(d)
+        if not name:
+            break
+        try:
+            if os.stat(parent).st_dev != dev:
+                break
+        except OSError:
+            # An unreadable ancestor; the names below it are still usable.
+            break
+        candidates.append((parent, name))
+        d = parent
+    try:
+        with os.scandir(path) as it:
+            candidates.extend((path, e.name) for e in it)
+    except OSError:
+        pass
+    for parent, name in candidates:
+        swapped = name.swapcase()
+        if swapped == name:
+            continue
+        try:
+            return os.path.samefile(os.path.join(parent, name),
+                                    os.path.join(parent, swapped))
+        except OSError:
+            # The case-swapped name does not exist.
+            return False
+    return None
+
+
+def is_case_insensitive(path):
+    """Whether the filesystem containing `path` is case insensitive.
+
+    The result is cached per device, and detection does not create any files.
+    Paths that do not exist are treated as case sensitive.
+    """
+    path = os.path.abspath(path)
+    if not os.path.isdir(path):
+        path = os.path.dirname(path)
+    try:
+        dev = os.stat(path).st_dev
+    except OSError:
+        return False
+    if dev not in _case_insensitive_devices:
+        result = _probe_case_insensitive(path, dev)
+        if result is None:
+            # Inconclusive; don't cache so that a later path can decide.
+            return False
+        _case_insensitive_devices[dev] = result
+    return _case_insensitive_devices[dev]
+
+
 class FileSystem(abc.ABC):
     """Interface for file systems."""
 
@@ -40,6 +110,22 @@ class FileSystem(abc.ABC):
         """
         return None
 
+    def find_module(self, path):
+        """Find the source file of a module.
+
+        Args:
+          path: The module's path without an extension, e.g. 'foo/bar' for
+            foo.bar.
+
+        Returns:
+          The path of the package's __init__.py or else of the module's .py
+          file, to pass to refer_to(), or None if neither exists.
+        """
+        for x in (os.path.join(path, '__init__.py'), path + '.py'):
+            if self.isfile(x):
+                return x
+        return None
+
 
 class StoredFileSystem(FileSystem):
     """File system based on a file list."""
@@ -61,20 +147,104 @@ class StoredFileSystem(FileSystem):
         return path
 
 
+# Marks a file in the trie of a ManifestFileSystem.
+_FILE = object()
+
+
+def _path_parts(path):
+    return [p for p in os.path.normpath(path).split(os.path.sep)
+            if p and p != '.']
+
+
+class ManifestFileSystem(FileSystem):
+    """File system over a known list of files under a root directory.
+
+    The files are stored in a trie of path components, so every ancestor
+    directory of a file is a directory, and lookups never touch the disk. Only
+    read() does, for files whose contents were not supplied.
+    """
+
+    def __init__(self, root, files):
+        """Index a list of files.
+
+        Args:
+          root: The directory that the file paths are relative to.
+          files: An iterable of relative file paths, or a dict of relative
+            file path to its contents (or None to read it from disk).
+
+        Raises:
+          FileSystemError: If a path is both a file and a directory.
+        """
+        self.root = root
+        self.contents = {}
+        self._trie = {}
+        for f in files:
+            parts = _path_parts(f)
+            if not parts:
+                raise FileSystemError('Not a file: %r' % f)
+            node = self._trie
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+                if node is _FILE:
+                    raise FileSystemError('Both a file and a directory: %r' % f)
+            if isinstance(node.setdefault(parts[-1], _FILE), dict):
+                raise FileSystemError('Both a file and a directory: %r' % f)
+            if isinstance(files, dict) and files[f] is not None:
+                self.contents[os.path.join(*parts)] = files[f]
+
+    def _lookup(self, path):
+        if os.path.isabs(path):
+            # Relative imports are resolved to absolute paths.
+            path = self.relative_path(path)
+            if path is None:
+                return None
+        node = self._trie
+        for part in _path_parts(path):
+            if node is _FILE:
+                return None
+            node = node.get(part)
+            if node is None:
+                return None
+        return node
+
+    def isfile(self, path):
+        return self._lookup(path) is _FILE
+
+    def isdir(self, path):
+        return isinstance(self._lookup(path), dict)
+
+    def read(self, path):
+        parts = _path_parts(path)
+        key = os.path.join(*parts) if parts else ''
+        if key in self.contents:
+            return self.contents[key]
+        with open(self.refer_to(path), 'r') as fi:
+            return fi.read()
+
+    def refer_to(self, path):
+        return os.path.join(self.root, path)
+
+    def relative_path(self, path):
+        if path == self.root:
+            return ''
+        if path.startswith(self.root + os.path.sep):
+            return path[len(self.root) + 1:]
+        return None
+
+
 class OSFileSystem(FileSystem):
     """File system that uses an OS file system underneath."""
 
     def __init__(self, root):
         assert root is not None
         self.root = root
-        _, tmp_path = tempfile.mkstemp()
-        self._is_case_insensitive = os.path.exists(tmp_path.upper())
+        self.is_case_insensitive = is_case_insensitive(root)
 
     def _join(self, path):
         return os.path.join(self.root, path)
 
     def _matches_path(self, path):
-        if self._is_case_insensitive:
+        if self.is_case_insensitive:
             return path in glob.glob(path+'*')
         return True
 
@@ -101,6 +271,76 @@ class OSFileSystem(FileSystem):
         return None
 
 
+class ListingFileSystem(OSFileSystem):
+    """OS file system that answers lookups from cached directory listings.
+
+    Each directory is listed once, with a single scandir call, and every
+    lookup in it is then answered from memory; names are matched exactly, so
+    this is case sensitive on any OS. find_module() checks all of a module's
+    candidate files, e.g. __init__.pyi, __init__.py, bar.pyi and bar.py, in
+    one call, preferring the extensions in the order given. With extensions
+    ('.pyi', '.py') this resolves like a PYIFileSystem followed by an
+    OSFileSystem over the same directory, with half the lookups.
+
+    Files created after a directory has been listed are not seen.
+    """
+
+    def __init__(self, root, extensions=('.py',)):
+        super(ListingFileSystem, self).__init__(root)
+        self.extensions = extensions
+        # Map of directory to (set of file names, set of directory names), or
+        # None if it is not a directory.
+        self._listings = {}
+
+    def _listing(self, path):
+        if path not in self._listings:
+            try:
+                with os.scandir(self._join(path)) as it:
+                    files, dirs = set(), set()
+                    for e in it:
+                        if e.is_dir():
+                            dirs.add(e.name)
+                        elif e.is_file():
+                            files.add(e.name)
+                    self._listings[path] = (files, dirs)
+            except OSError:
+                self._listings[path] = None
+        return self._listings[path]
+
+    def _contains(self, path, index):
+        dirname, name = os.path.split(os.path.normpath(path))
+        listing = self._listing(dirname)
+        return listing is not None and name in listing[index]
+
+    def isfile(self, path):
+        assert path is not None
+        return self._contains(path, 0)
+
+    def isdir(self, path):
+        assert path is not None
+        if os.path.normpath(path) == '.':
+            return self._listing('') is not None
+        return self._contains(path, 1)
+
+    def find_module(self, path):
+        dirname, name = os.path.split(os.path.normpath(path))
+        listing = self._listing(dirname)
+        if listing is None:
+            return None
+        files, dirs = listing
+        init_files = ()
+        if name in dirs:
+            package = self._listing(os.path.join(dirname, name))
+            if package is not None:
+                init_files = package[0]
+        for ext in self.extensions:
+            if '__init__' + ext in init_files:
+                return os.path.join(path, '__init__' + ext)
+            if name + ext in files:
+                return path + ext
+        return None
+
+
 class RemappingFileSystem(FileSystem, abc.ABC):
     """File system wrapper that transforms a path before looking it up."""
 
@@ -145,6 +385,90 @@ class PYIFileSystem(ExtensionRemappingFileSystem):
         super(PYIFileSystem, self).__init__(underlying, 'pyi')
 
 
+class CachingFileSystem(FileSystem):
+    """File system wrapper that remembers the results of lookups.
+
+    Lets several graphs, e.g. for different python versions, share the
+    filesystem probes made while resolving imports.
+    """
+
+    def __init__(self, underlying):
+        self.underlying = underlying
+        self._isfile = {}
+        self._isdir = {}
+        self._modules = {}
+
+    def isfile(self, path):
+        if path not in self._isfile:
+            self._isfile[path] = self.underlying.isfile(path)
+        return self._isfile[path]
+
+    def isdir(self, path):
+        if path not in self._isdir:
+            self._isdir[path] = self.underlying.isdir(path)
+        return self._isdir[path]
+
+    def find_module(self, path):
+        if path not in self._modules:
+            find_module = getattr(self.underlying, 'find_module', None)
+            if find_module is not None:
+                self._modules[path] = find_module(path)
+            else:
+                # A duck-typed file system such as TarFileSystem; probe it
+                # through the cached isfile().
+                self._modules[path] = super(
+                    CachingFileSystem, self).find_module(path)
+        return self._modules[path]
+
+    def read(self, path):
+        return self.underlying.read(path)
+
+    def refer_to(self, path):
+        return self.underlying.refer_to(path)
+
+    def relative_path(self, path):
+        relative_path = getattr(self.underlying, 'relative_path', None)
+        return relative_path(path) if relative_path else None
+
+
+class LatencyFileSystem(FileSystem):
+    """File system wrapper that delays every lookup and read.
+
+    Simulates a network filesystem such as NFS, e.g. to benchmark the
+    concurrent crawl in async_crawl.py against a local tree. Only the
+    resolver's probes go through the file system: the parser opens files
+    directly, so parsing a file is not delayed.
+    """
+
+    def __init__(self, underlying, latency):
+        """Wrap a file system.
+
+        Args:
+          underlying: The FileSystem to delegate to.
+          latency: The delay in seconds added to each isfile, isdir and read.
+        """
+        self.underlying = underlying
+        self.latency = latency
+
+    def isfile(self, path):
+        time.sleep(self.latency)
+        return self.underlying.isfile(path)
+
+    def isdir(self, path):
+        time.sleep(self.latency)
+        return self.underlying.isdir(path)
+
+    def read(self, path):
+        time.sleep(self.latency)
+        return self.underlying.read(path)
+
+    def refer_to(self, path):
+        return self.underlying.refer_to(path)
+
+    def relative_path(self, path):
+        return self.underlying.relative_path(path)
+
+
 class TarFileSystem(object):
     """Filesystem that serves files out of a .tar."""
 
@@ -183,6 +507,8 @@ class Path(object):
             path = OSFileSystem(path)
         elif kind == 'pyi':
             path = PYIFileSystem(OSFileSystem(path))
+        elif kind == 'pyi+py':
+            path = ListingFileSystem(path, ('.pyi', '.py'))
         else:
             raise FileSystemError('Unrecognized filesystem type: ', kind)
         self.paths.append(path)
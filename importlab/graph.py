@@ -1,10 +1,26 @@
+import ast
 import collections
 import os
+import sys
+import threading
+import time
 
-import networkx as nx
-
+from . import import_finder
 from . import resolve
 from . import parsepy
+from . import trace
+from . import utils
+
+nx = utils.LazyModule('networkx')
+
+
+def _compiles(src):
+    """Whether source code is syntactically valid for the host python."""
+    try:
+        compile(src, '<prefilter>', 'exec', ast.PyCF_ONLY_AST)
+    except (SyntaxError, ValueError):
+        return False
+    return True
 
 
 class NodeSet(object):
@@ -29,6 +45,44 @@ class NodeSet(object):
         return self.nodes.__iter__()
 
 
+class CrawlBudget(object):
+    """Limits on how much of the dependency graph a crawl explores.
+
+    Files at a depth of max_depth imports from a source, and any files reached
+    after max_files files have been read or max_seconds have passed, are added
+    to the graph without reading their dependencies, and are recorded in
+    DependencyGraph.truncated.
+
+    A budget is shared by every crawl of a graph; the time limit starts with
+    the first crawl. A file's depth is its smallest distance from any source,
+    so the files truncated by max_depth alone do not depend on the order the
+    sources are crawled in.
+    """
+
+    def __init__(self, max_depth=None, max_files=None, max_seconds=None):
+        self.max_depth = max_depth
+        self.max_files = max_files
+        self.max_seconds = max_seconds
+        # The number of files whose dependencies have been read.
+        self.files = 0
+        self._deadline = None
+
+    def start(self):
+        if self.max_seconds is not None and self._deadline is None:
+            self._deadline = time.monotonic() + self.max_seconds
+
+    def exhausted(self):
+        """Whether the file or time limit has been reached."""
+        return ((self.max_files is not None and self.files >= self.max_files) or
+                (self._deadline is not None and
+                 time.monotonic() >= self._deadline))
+
+    def allows(self, depth):
+        """Whether to read the dependencies of a file at the given depth."""
+        return ((self.max_depth is None or depth < self.max_depth) and
+                not self.exhausted())
+
+
 class DependencyGraph(object):
     """A set of file dependencies stored in a graph structure.
 
@@ -46,6 +100,9 @@ class DependencyGraph(object):
         self.broken_deps = collections.defaultdict(set)
         # files that were not syntactically valid python.
         self.unreadable_files = set()
+        # files that are not python source, such as extension modules. They
+        # are added as leaves without being read (see resolve.is_source_path).
+        self.non_source_files = set()
         # once self.final is set the graph can no longer be modified.
         self.final = False
         # sources is a set of files directly added to the graph via
@@ -54,10 +111,28 @@ class DependencyGraph(object):
         # provenance is a map of file path (as stored in the graph) to where the
         # file was sourced from (see resolve.ResolvedFile)
         self.provenance = {}
+        # An optional CrawlBudget limiting add_file_recursive.
+        self.budget = None
+        # files whose dependencies were not read because the budget ran out.
+        self.truncated = set()
+        # The smallest depth from a source that each file has been crawled at
+        # under a budget, so that truncation does not depend on the order of
+        # the sources.
+        self._depths = {}
+        # A trace.Tracer recording the time spent in each step.
+        self.tracer = trace.NullTracer()
 
     def get_file_deps(self, filename):
         raise NotImplementedError()
 
+    def prefetch(self, filenames):
+        """Prepare to get the dependencies of several files.
+
+        crawl() calls this with the files it is about to visit, so that
+        subclasses can read them in bulk. The default does nothing.
+        """
+        pass
+
     def add_source_file(self, filename):
         self.sources.add(filename)
         self.provenance[filename] = self.get_source_file_provenance(filename)
@@ -78,13 +153,25 @@ class DependencyGraph(object):
         for imp in unresolved:
             self.broken_deps[filename].add(imp)
 
-    def follow_file(self, f, seen, trim):
-        """Whether to recurse into a file's dependencies."""
-        return (f not in self.graph.nodes and
-                f not in seen and
-                (not trim or
-                 not isinstance(self.provenance[f],
-                                (resolve.Builtin, resolve.System))))
+    def follow_file(self, f, seen, trim, depth=None):
+        """Whether to recurse into a file's dependencies.
+
+        Args:
+          f: The file.
+          seen: The files already queued by the current crawl.
+          trim: Whether to trim the dependencies of builtin and system files.
+          depth: The depth f would be crawled at, under a budget. A file that
+            is already in the graph is crawled again if it is now reached at
+            a smaller depth than before.
+        """
+        if (f in seen or
+                not resolve.is_source_path(f) or
+                (trim and isinstance(self.provenance[f],
+                                     (resolve.Builtin, resolve.System)))):
+            return False
+        if f not in self.graph.nodes:
+            return True
+        return depth is not None and depth < self._depths.get(f, depth)
 
     def add_file_recursive(self, filename, trim=False):
         """Add a file and all its recursive dependencies to the graph.
@@ -96,34 +183,99 @@ class DependencyGraph(object):
 
         assert not self.final, 'Trying to mutate a final graph.'
         self.add_source_file(filename)
-        queue = collections.deque([filename])
+        self.crawl(filename, trim)
+
+    def crawl(self, filename, trim=False):
+        """Add the recursive dependencies of a file to the graph.
+
+        Unlike add_file_recursive, this does not mark the file as a source, so
+        its provenance must already be recorded.
+
+        Args:
+          filename: The name of the file.
+          trim: Whether to trim the dependencies of builtin and system files.
+        """
+
+        assert not self.final, 'Trying to mutate a final graph.'
+        budget = self.budget
+        if budget is not None:
+            budget.start()
+        queue = collections.deque([(filename, 0)])
         seen = set()
+        prefetched = set()
         while queue:
-            filename = queue.popleft()
+            filename, depth = queue.popleft()
+            if not resolve.is_source_path(filename):
+                self.graph.add_node(filename)
+                self.non_source_files.add(filename)
+                continue
+            if budget is None and filename not in prefetched:
+                # Everything in the queue will be visited, so announce it all.
+                batch = [filename] + [f for f, _ in queue]
+                prefetched.update(batch)
+                self.prefetch(batch)
             self.graph.add_node(filename)
+            if budget is not None:
+                visited = self.visit_depth(filename, depth) is not None
+                if visited and filename not in self.truncated:
+                    # Already read from a deeper point, so only its
+                    # dependencies need to be crawled again.
+                    for f in self.graph.successors(filename):
+                        if self.follow_file(f, seen, trim, depth + 1):
+                            queue.append((f, depth + 1))
+                            seen.add(f)
+                    continue
+                if not budget.allows(depth):
+                    self.truncated.add(filename)
+                    continue
+                budget.files += 1
+                self.truncated.discard(filename)
             try:
                 deps, broken = self.get_file_deps(filename)
             except parsepy.ParseError:
-                # Python couldn't parse `filename`. If we're sure that it is a
-                # Python file, we mark it as unreadable and keep the node in the
-                # graph so importlab's callers can do their own syntax error
-                # handling if desired.
-                if os.path.splitext(filename)[1] in ('.py', '.so'):
-                    self.unreadable_files.add(filename)
-                else:
-                    self.graph.remove_node(filename)
+                self.add_unreadable_file(filename)
                 continue
-            for f in broken:
-                self.broken_deps[filename].add(f)
             for f in deps:
-                if self.follow_file(f, seen, trim):
-                    queue.append(f)
+                if self.follow_file(f, seen, trim, depth + 1):
+                    queue.append((f, depth + 1))
                     seen.add(f)
-                self.graph.add_node(f)
-                if filename != f:
-                  # Prevent self edges if our dependency checker mistakenly
-                  # detects a module as its own direct dependency.
-                  self.graph.add_edge(filename, f)
+            self.add_file_deps(filename, deps, broken)
+
+    def visit_depth(self, filename, depth):
+        """Record the depth a file is crawled at under a budget.
+
+        Returns:
+          The smallest depth the file was crawled at before, or None if it
+          was not crawled before. Files that have been crawled have been read,
+          found unreadable, or truncated.
+        """
+        previous = self._depths.get(filename)
+        if previous is None or depth < previous:
+            self._depths[filename] = depth
+        return previous
+
+    def add_unreadable_file(self, filename):
+        """Record a file whose dependencies could not be parsed."""
+        # Python couldn't parse `filename`. If we're sure that it is a Python
+        # file, we mark it as unreadable and keep the node in the graph so
+        # importlab's callers can do their own syntax error handling if desired.
+        if os.path.splitext(filename)[1] == '.py':
+            self.unreadable_files.add(filename)
+        else:
+            self.graph.remove_node(filename)
+
+    def add_file_deps(self, filename, deps, broken):
+        """Add the edges from a file to its dependencies."""
+        for f in broken:
+            self.broken_deps[filename].add(f)
+        for f in deps:
+            self.graph.add_node(f)
+            if not resolve.is_source_path(f):
+                self.non_source_files.add(f)
+            if filename != f:
+              # Prevent self edges if our dependency checker mistakenly
+              # detects a module as its own direct dependency.
+              self.graph.add_edge(filename, f)
 
     def shrink_to_node(self, scc):
         """Shrink a strongly connected component into a node."""
@@ -161,6 +313,7 @@ class DependencyGraph(object):
 
         assert not self.final, 'Trying to mutate a final graph.'
 
+        start = time.perf_counter()
         # Replace each strongly connected component with a single node `NodeSet`
         for scc in sorted(nx.kosaraju_strongly_connected_components(self.graph),
                           key=len, reverse=True):
@@ -170,6 +323,8 @@ class DependencyGraph(object):
             self.shrink_to_node(NodeSet(scc))
 
         self.final = True
+        self.tracer.add_span('build', 'graph', start, time.perf_counter(),
+                             {'nodes': self.graph.number_of_nodes()})
 
     def sorted_source_files(self):
         """Returns a list of targets in topologically sorted order."""
@@ -184,13 +339,24 @@ class DependencyGraph(object):
                 out.append([node])
         return list(reversed(out))
 
-    def deps_list(self):
-        """Returns a list of (target, dependencies)."""
+    def deps_list(self, reduced=False):
+        """Returns a list of (target, dependencies).
+
+        Args:
+          reduced: Whether to leave out dependencies that are also reached
+            through another dependency (see reachability.transitive_reduction).
+        """
 
         assert self.final, 'Call build() before using the graph.'
+        redundant = set()
+        if reduced:
+            # reachability imports this module.
+            from . import reachability
+            redundant = reachability.transitive_reduction(self)
         out = []
         for node in nx.topological_sort(self.graph):
-            deps = [v for k, v in self.graph.out_edges([node])]
+            deps = [v for k, v in self.graph.out_edges([node])
+                    if (k, v) not in redundant]
             out.append((node, deps))
         return out
 
@@ -206,28 +372,91 @@ class DependencyGraph(object):
 class ImportGraph(DependencyGraph):
     """A dependency graph built from file imports."""
 
-    def __init__(self, env):
+    def __init__(self, env, prefilter=False, collapse_system=False,
+                 budget=None, bytecode=False, manifest=None, tracer=None):
         super(ImportGraph, self).__init__()
         self.env = env
+        self.budget = budget
+        if tracer is not None:
+            self.tracer = tracer
+        # Whether to only parse the part of each file that can contain imports
+        # (see import_finder.get_imports).
+        self.prefilter = prefilter
+        # Whether to read imports from up to date cached bytecode when there
+        # is some (see import_finder.get_imports).
+        self.bytecode = bytecode
+        # Whether to represent each system package by a single node for its
+        # top-level package (see resolve.top_level_package).
+        self.collapse_system = collapse_system
         self.path = env.path
         self.major_version = env.python_version[0]
+        # Guards the parse caches, statistics and provenance below, which
+        # get_file_deps updates from the worker threads of an async_crawl.
+        self._lock = threading.Lock()
+        # Interned resolve.ResolvedFile objects, shared between identical
+        # resolutions from different importing files.
+        self._resolved_files = {}
+        # Map of file content digest to the parsed import statements (or None
+        # for a parse error), so identical files are only parsed once.
+        self._imports_by_digest = {}
+        # Counts of files parsed, of parses saved by deduplication, and of
+        # files whose imports were known from a manifest.
+        self.parse_stats = collections.Counter()
+        # Map of file path to the seconds spent parsing it, or parsing an
+        # identical file whose imports were reused. Files whose imports were
+        # known from a manifest are not included.
+        self.parse_times = {}
+        self._parse_times_by_digest = {}
+        # Digests of files parsed by prefetch() and not yet used, and of the
+        # files they were computed for.
+        self._prefetched = set()
+        self._digests = {}
+        # Map of the digest of a prefilter region to whether it ends in the
+        # middle of a statement (see _hash).
+        self._incomplete_regions = {}
+        # Imports listed in a manifest.Manifest, by file path. Its digests
+        # save hashing the files.
+        self._known_imports = {}
+        if manifest is not None:
+            self._digests.update(manifest.digests)
+            self._known_imports.update(manifest.imports)
 
     @classmethod
-    def create(cls, env, filenames, trim=False):
+    def create(cls, env, filenames, trim=False, prefilter=False,
+               collapse_system=False, budget=None, bytecode=False,
+               manifest=None, tracer=None):
         """Create and return a final graph.
 
         Args:
           env: An environment.Environment object
-          filenames: A list of filenames
+          filenames: An iterable of filenames. This may be a generator such as
+            utils.iter_source_files, in which case the crawl starts on the
+            first files while discovery is still running.
           trim: Whether to trim the dependencies of builtin and system files.
+          prefilter: Whether to skip parsing past the last import in each file.
+            Syntax errors after the last import are then not detected.
+          collapse_system: Whether to collapse system modules into one node per
+            top-level package, e.g. a single node for all of numpy. Implies
+            trim, since the collapsed nodes are package directories.
+          budget: An optional CrawlBudget. Files whose dependencies were not
+            read because of it are listed in the graph's `truncated` set.
+          bytecode: Whether to read the imports of files with an up to date
+            __pycache__ entry from their bytecode rather than their source.
+          manifest: An optional manifest.Manifest whose imports and digests
+            are used rather than reading the files. The environment's path
+            should include its filesystem.
+          tracer: An optional trace.Tracer to record the crawl's timeline in.
 
         Returns:
           An immutable ImportGraph with the recursive dependencies of all the
           files in filenames
         """
-        import_graph = cls(env)
-        for filename in filenames:
-            import_graph.add_file_recursive(os.path.abspath(filename), trim)
+        import_graph = cls(env, prefilter, collapse_system, budget, bytecode,
+                           manifest, tracer)
+        trim = trim or collapse_system
+        with import_graph.tracer.span('crawl', 'graph'):
+            for filename in filenames:
+                import_graph.add_file_recursive(os.path.abspath(filename), trim)
         import_graph.build()
         return import_graph
 
@@ -236,19 +465,170 @@ class ImportGraph(DependencyGraph):
         module_name = resolve.infer_module_name(filename, self.path)
         return resolve.Direct(filename, module_name)
 
+    def get_imports(self, filename):
+        """Parse a file's imports, reusing the result for identical files.
+
+        Import statements only record where python itself resolved an absolute
+        import, so they are independent of the file's location and can be
+        shared; relative imports are still resolved per file by the caller.
+        """
+        if filename in self._known_imports:
+            with self._lock:
+                self.parse_stats['known'] += 1
+            return self._known_imports[filename]
+        with self._lock:
+            digest = self._digests.pop(filename, None)
+        if digest is None:
+            digest = self._hash(filename)
+        with self._lock:
+            cached = digest in self._imports_by_digest
+            if cached:
+                imports = self._imports_by_digest[digest]
+                self.parse_times[filename] = (
+                    self._parse_times_by_digest[digest])
+                if digest in self._prefetched:
+                    self._prefetched.remove(digest)
+                    self.parse_stats['parsed'] += 1
+                else:
+                    self.parse_stats['reused'] += 1
+            else:
+                self.parse_stats['parsed'] += 1
+        if cached:
+            if imports is None:
+                raise parsepy.ParseError(filename)
+            return imports
+        start = time.perf_counter()
+        try:
+            imports = parsepy.get_imports(
+                filename, self.env.python_version, self.prefilter,
+                self.bytecode)
+        except parsepy.ParseError:
+            self._finish_parse(filename, digest, None, start)
+            raise
+        self._finish_parse(filename, digest, imports, start)
+        return imports
+
+    def _finish_parse(self, filename, digest, imports, start):
+        """Record the imports (None for a parse error) and time of a parse."""
+        end = time.perf_counter()
+        with self._lock:
+            self.parse_times[filename] = end - start
+            if digest is not None:
+                self._imports_by_digest[digest] = imports
+                self._parse_times_by_digest[digest] = end - start
+        self.tracer.add_span(
+            'parse', self._parse_category(), start, end, {'file': filename})
+
+    def _hash(self, filename):
+        """A digest of the part of a file that its imports are read from.
+
+        With the prefilter only the region it parses is hashed, so that the
+        rest of a large file is not read just to deduplicate it. A region that
+        ends in the middle of a statement is parsed with the rest of the file
+        (see import_finder._parse_imports), so then the whole file is hashed.
+
+        Returns:
+          The digest, or None if the file cannot be read.
+        """
+        try:
+            if not self.prefilter:
+                return utils.hash_file(filename)
+            region, whole = import_finder.read_import_region(filename)
+            digest = utils.hash_bytes(region)
+            if whole:
+                return digest
+            incomplete = self._incomplete_regions.get(digest)
+            if incomplete is None:
+                incomplete = not _compiles(region)
+                with self._lock:
+                    self._incomplete_regions[digest] = incomplete
+            if incomplete:
+                return utils.hash_file(filename)
+            return digest
+        except OSError:
+            return None
+
+    def _parse_category(self):
+        if self.env.python_version == sys.version_info[:2]:
+            return 'parse'
+        return 'parse,subprocess'
+
+    def prefetch(self, filenames):
+        """Parse files for another python version in a single subprocess.
+
+        Files for the host version are parsed in process, so there is no round
+        trip to save.
+        """
+        if self.env.python_version == sys.version_info[:2]:
+            return
+        todo = collections.OrderedDict()
+        for filename in filenames:
+            if filename in self._known_imports:
+                continue
+            digest = self._digests.get(filename)
+            if digest is None:
+                digest = self._hash(filename)
+                if digest is None:
+                    continue
+            self._digests[filename] = digest
+            if digest not in self._imports_by_digest and digest not in todo:
+                todo[digest] = filename
+        if not todo:
+            return
+        start = time.perf_counter()
+        results = parsepy.get_imports_batch(
+            list(todo.values()), self.env.python_version, self.prefilter,
+            self.bytecode)
+        end = time.perf_counter()
+        self.tracer.add_span('parse batch', self._parse_category(), start, end,
+                             {'files': len(todo)})
+        # Split the time of the batch evenly between its files.
+        elapsed = (end - start) / len(todo)
+        for digest, imports in zip(todo, results):
+            if isinstance(imports, parsepy.ParseError):
+                imports = None
+            self._imports_by_digest[digest] = imports
+            self._parse_times_by_digest[digest] = elapsed
+            self._prefetched.add(digest)
+
+    def resolve_file_imports(self, filename):
+        """Parse and resolve the imports of a file.
+
+        Returns:
+          A list of (ImportStatement, full path) pairs, with a path of None for
+          unresolved imports. Builtin imports are omitted.
+        """
+        out = []
+        parent = self.provenance[filename]
+        r = resolve.Resolver(self.path, parent)
+        imports = self.get_imports(filename)
+        with self.tracer.span('resolve', 'resolve', file=filename):
+            resolved = r.resolve_imports(imports)
+        for imp, f in zip(imports, resolved):
+            if isinstance(f, resolve.ImportException):
+                out.append((imp, None))
+                continue
+            if isinstance(f, resolve.Builtin):
+                continue
+            if self.collapse_system and isinstance(f, resolve.System):
+                f = resolve.top_level_package(f)
+            full_path = os.path.abspath(f.path)
+            with self._lock:
+                f = self._resolved_files.setdefault(f, f)
+                # Keep the provenance of source files, which may be imported
+                # by files crawled before or after them.
+                if not isinstance(self.provenance.get(full_path),
+                                  resolve.Direct):
+                    self.provenance[full_path] = f
+            out.append((imp, full_path))
+        return out
+
     def get_file_deps(self, filename):
         resolved = []
         unresolved = []
-        parent = self.provenance[filename]
-        r = resolve.Resolver(self.path, parent)
-        for imp in parsepy.get_imports(filename, self.env.python_version):
-            try:
-                f = r.resolve_import(imp)
-                if isinstance(f, resolve.Builtin):
-                    continue
-                full_path = os.path.abspath(f.path)
-                resolved.append(full_path)
-                self.provenance[full_path] = f
-            except resolve.ImportException:
+        for imp, full_path in self.resolve_file_imports(filename):
+            if full_path is None:
                 unresolved.append(imp)
+            else:
+                resolved.append(full_path)
         return (resolved, unresolved)
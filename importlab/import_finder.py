@@ -6,7 +6,11 @@ from __future__ import print_function
 
 import ast
 import json
+import marshal
+import mmap
 import os
+import re
+import struct
 import sys
 
 # Pytype doesn't recognize the `major` attribute:
@@ -134,26 +138,258 @@ def resolve_import(name, is_from, is_star):
     return ret
 
 
-def get_imports(filename):
+def read_import_region(filename):
+    """Read the part of a file that the import prefilter parses.
+
+    The file is mapped into memory and searched for the `import` keyword
+    without copying it, and only the source up to the end of the line holding
+    the last `import` is materialized.
+
+    Returns:
+      A tuple of (the region, whether it is the whole file). The region is
+      empty if the file never mentions `import`.
+    """
+    with open(filename, "rb") as f:
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped.
+            return b"", True
+        except (OSError, EnvironmentError):
+            # Not a mappable file; fall back to reading it.
+            m = f.read()
+        try:
+            end = m.rfind(b"import")
+            if end == -1:
+                return b"", len(m) == 0
+            eol = m.find(b"\n", end)
+            end = len(m) if eol == -1 else eol + 1
+            return m[:end], end == len(m)
+        finally:
+            if isinstance(m, mmap.mmap):
+                m.close()
+
+
+def _read_source(filename, prefilter):
+    """Read the part of a file that import extraction needs.
+
+    Without `prefilter` this is the whole file. With it, this is the region
+    returned by read_import_region, or None if the file never mentions
+    `import` and need not be parsed at all.
+    """
+    if prefilter:
+        return read_import_region(filename)[0] or None
+    with open(filename, "rb") as f:
+        return f.read()
+
+
+# Lines that start an import statement, used to check that bytecode has not
+# lost any imports, e.g. in code that the compiler removed as unreachable.
+_IMPORT_LINE = re.compile(
+    br'^[ \t]*(?:import[ \t]+[\w.]|from[ \t]+[\w.]+[ \t]+import\b)', re.M)
+
+_SKIPPED_OPS = ('CACHE', 'EXTENDED_ARG', 'NOP')
+_STORE_OPS = ('STORE_NAME', 'STORE_FAST', 'STORE_GLOBAL', 'STORE_DEREF')
+# Names that may have been mangled by the compiler inside a class, e.g. `__x`
+# stored as `_A__x` in class A. The source name cannot be recovered, so such
+# files are parsed instead.
+_MANGLED_NAME = re.compile(r'(?:^|\.)_[^_][\w]*?__(?!\w*__(?:\.|$))')
+
+
+def _load_cached_code(filename, src):
+    """Load the code object of an up to date __pycache__ file, or None."""
+    import importlib.util
+    try:
+        pyc = importlib.util.cache_from_source(filename)
+        with open(pyc, 'rb') as f:
+            data = f.read()
+        st = os.stat(filename)
+    except (NotImplementedError, ValueError, OSError, EnvironmentError):
+        return None
+    if len(data) < 16 or data[:4] != importlib.util.MAGIC_NUMBER:
+        return None
+    flags = struct.unpack('<I', data[4:8])[0]
+    if flags & 1:
+        # Hash-based pyc (PEP 552).
+        if data[8:16] != importlib.util.source_hash(src):
+            return None
+    elif data[8:16] != struct.pack('<II', int(st.st_mtime) & 0xffffffff,
+                                   st.st_size & 0xffffffff):
+        return None
+    try:
+        return marshal.loads(data[16:])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def _code_imports(code):
+    """Reconstruct ImportFinder tuples from the instructions of a code object.
+
+    Returns:
+      A list of ((lineno, col_offset, index), import tuple), or None if the
+      instructions do not follow a known pattern.
+    """
+    import dis
+    out = []
+    if bytes(bytearray([dis.opmap['IMPORT_NAME']])) in code.co_code[::2]:
+        insts = [i for i in dis.get_instructions(code)
+                 if i.opname not in _SKIPPED_OPS]
+    else:
+        # Disassembly is slow, so skip code objects without imports.
+        insts = []
+    lineno = col = 0
+    for n, inst in enumerate(insts):
+        positions = getattr(inst, 'positions', None)
+        if positions is not None and positions.lineno is not None:
+            lineno, col = positions.lineno, positions.col_offset
+        elif getattr(inst, 'starts_line', None):
+            lineno = inst.starts_line
+        if inst.opname != 'IMPORT_NAME':
+            continue
+        if n < 2 or insts[n - 2].opname != 'LOAD_CONST' or (
+                insts[n - 1].opname != 'LOAD_CONST'):
+            return None
+        level, fromlist = insts[n - 2].argval, insts[n - 1].argval
+        if _MANGLED_NAME.search(inst.argval):
+            return None
+        key = (lineno, col, len(out))
+        if fromlist is None:
+            # import a.b [as c]: the module (or, with an alias, the submodule
+            # fetched with IMPORT_FROM) is stored in a variable.
+            m = n + 1
+            aliased = False
+            while m < len(insts) and insts[m].opname in (
+                    'IMPORT_FROM', 'SWAP', 'ROT_TWO', 'POP_TOP'):
+                aliased = aliased or insts[m].opname == 'IMPORT_FROM'
+                m += 1
+            if m == len(insts) or insts[m].opname not in _STORE_OPS:
+                return None
+            target = insts[m].argval
+            if _MANGLED_NAME.search(target):
+                return None
+            if not aliased and target == inst.argval.split('.')[0]:
+                target = None
+            out.append((key, (inst.argval, target, False, False)))
+            continue
+        module_name = '.' * level + inst.argval
+        if fromlist == ('*',):
+            out.append((key, (module_name, None, True, True)))
+            continue
+        if not module_name.endswith('.'):
+            module_name += '.'
+        m = n + 1
+        for name in fromlist:
+            if (m + 1 >= len(insts) or insts[m].opname != 'IMPORT_FROM' or
+                    insts[m].argval != name or
+                    insts[m + 1].opname not in _STORE_OPS or
+                    _MANGLED_NAME.search(insts[m + 1].argval)):
+                return None
+            out.append(((lineno, col, len(out)),
+                        (module_name + name, insts[m + 1].argval, True, False)))
+            m += 2
+    # The compiler may emit the same statement more than once, e.g. in both the
+    # normal and the exceptional path of a `finally` block. That cannot be told
+    # apart from a statement that repeats a name, so give up on both.
+    statements = {}
+    for key, imp in out:
+        statements.setdefault(key[:2], []).append(imp)
+    for imps in statements.values():
+        for period in range(1, len(imps) // 2 + 1):
+            if imps == imps[:period] * (len(imps) // period):
+                return None
+    for const in code.co_consts:
+        if isinstance(const, type(code)):
+            nested = _code_imports(const)
+            if nested is None:
+                return None
+            out.extend(nested)
+    return out
+
+
+def _bytecode_imports(filename):
+    """Read the imports of a file from its cached bytecode.
+
+    Returns:
+      A list of ImportFinder tuples, in the order ImportFinder would find them,
+      or None if there is no up to date bytecode or the imports cannot be
+      reconstructed with certainty.
+    """
+    if sys.version_info < (3, 7):
+        # Older pyc headers and bytecode are not supported.
+        return None
+    with open(filename, 'rb') as f:
+        src = f.read()
+    code = _load_cached_code(filename, src)
+    if code is None:
+        return None
+    found = _code_imports(code)
+    if found is None:
+        return None
+    # Every import statement must have survived compilation.
+    lines = set()
+    lineno, pos = 1, 0
+    for m in _IMPORT_LINE.finditer(src):
+        lineno += src.count(b'\n', pos, m.start())
+        pos = m.start()
+        lines.add(lineno)
+    if lines != set(key[0] for key, _ in found):
+        return None
+    # `import a as a` compiles to the same instructions as `import a`, but the
+    # parser reports the alias. Fall back if the source might contain one.
+    for _, (name, alias, is_from, _) in found:
+        if not is_from and alias is None and re.search(
+                br'\bas[ \t\\\r\n]+' + re.escape(name.encode('utf-8')) +
+                br'\b', src):
+            return None
+    return [imp for _, imp in sorted(found, key=lambda x: x[0])]
+
+
+def get_imports(filename, prefilter=False, bytecode=False):
     """Get all the imports in a file.
 
     Each import is a tuple of:
       (name, alias, is_from, is_star, source_file)
+
+    Args:
+      filename: The file to read.
+      prefilter: Only parse the part of the file that can contain imports
+        (see _read_source). This is much faster for large generated files, at
+        the cost of not reporting syntax errors that come after the last
+        import.
+      bytecode: Read the imports from the file's __pycache__ entry if it is up
+        to date, rather than parsing the source (see _bytecode_imports).
     """
-    with open(filename, "rb") as f:
-        src = f.read()
-    finder = ImportFinder()
-    finder.visit(ast.parse(src, filename=filename))
+    found = _bytecode_imports(filename) if bytecode else None
+    if found is None:
+        found = _parse_imports(filename, prefilter)
     imports = []
-    for i in finder.imports:
+    for i in found:
         name, _, is_from, is_star = i
         imports.append(i + (resolve_import(name, is_from, is_star),))
     return imports
 
 
-def print_imports(filename):
+def _parse_imports(filename, prefilter):
+    """Get the ImportFinder tuples of a file by parsing its source."""
+    src = _read_source(filename, prefilter)
+    if src is None:
+        return []
+    try:
+        tree = ast.parse(src, filename=filename)
+    except SyntaxError:
+        if not prefilter:
+            raise
+        # The truncated source may end in the middle of a statement, e.g. a
+        # parenthesised `from x import (...)`, so retry with the whole file.
+        tree = ast.parse(_read_source(filename, False), filename=filename)
+    finder = ImportFinder()
+    finder.visit(tree)
+    return finder.imports
+
+
+def print_imports(filename, prefilter=False):
     """Print imports in csv format to stdout."""
-    print(json.dumps(get_imports(filename)))
+    print(json.dumps(get_imports(filename, prefilter)))
 
 
 def read_imports(imports_str):
@@ -161,8 +397,147 @@ def read_imports(imports_str):
     return json.loads(imports_str)
 
 
+# Binary protocol used by parsepy to parse batches of files with another
+# python version. All integers are unsigned, little-endian and 32-bit unless
+# noted otherwise.
+#
+# Request (stdin): for each file, the length of its name followed by the name.
+# Response (stdout): for each file, in order, the length of a record followed
+# by the record:
+#   status (8-bit): 0 if the file was parsed, 1 if not.
+#   The number of new strings, followed by each string's length and bytes. New
+#   strings are appended to a table of strings shared by all the records in
+#   the response, so each module name and source path is only sent once.
+#   The number of imports, followed by each import's name, alias and source as
+#   string table indices (_NONE for None) and a flags byte (1 for is_from, 2
+#   for is_star).
+
+_NONE = 0xffffffff
+_IMPORT = struct.Struct('<IIIB')
+
+if sys.version_info[0] >= 3:
+    def _encode(s):
+        return s.encode('utf-8', 'surrogateescape')
+
+    def _decode(b):
+        return b.decode('utf-8', 'surrogateescape')
+
+    _decode_filename = os.fsdecode
+else:
+    def _encode(s):
+        if not isinstance(s, bytes):
+            return s.encode('utf-8')
+        return s
+
+    def _decode(b):
+        return b
+
+    def _decode_filename(b):
+        return b
+
+
+class RecordWriter(object):
+    """Encode the imports of successive files in the binary protocol."""
+
+    def __init__(self):
+        self.strings = {}
+
+    def _ref(self, s, new_strings):
+        if s is None:
+            return _NONE
+        s = _encode(s)
+        if s not in self.strings:
+            self.strings[s] = len(self.strings)
+            new_strings.append(s)
+        return self.strings[s]
+
+    def record(self, imports):
+        """Encode the result of get_imports(), or None for an error."""
+        new_strings = []
+        body = []
+        for name, alias, is_from, is_star, source in imports or ():
+            body.append(_IMPORT.pack(
+                self._ref(name, new_strings), self._ref(alias, new_strings),
+                self._ref(source, new_strings),
+                int(bool(is_from)) | int(bool(is_star)) << 1))
+        parts = [struct.pack('<BI', imports is None, len(new_strings))]
+        for s in new_strings:
+            parts.append(struct.pack('<I', len(s)))
+            parts.append(s)
+        parts.append(struct.pack('<I', len(body)))
+        parts.extend(body)
+        payload = b''.join(parts)
+        return struct.pack('<I', len(payload)) + payload
+
+
+def read_records(data):
+    """Decode a response in the binary protocol.
+
+    Yields:
+      For each file, a list of (name, alias, is_from, is_star, source) tuples,
+      or None if the file could not be parsed. A truncated record at the end
+      of the data is skipped.
+    """
+    strings = []
+    pos = 0
+    while pos < len(data):
+        (length,) = struct.unpack_from('<I', data, pos)
+        pos += 4
+        end = pos + length
+        if end > len(data):
+            # The subprocess died while writing this record.
+            return
+        status, count = struct.unpack_from('<BI', data, pos)
+        pos += 5
+        for _ in range(count):
+            (size,) = struct.unpack_from('<I', data, pos)
+            pos += 4
+            strings.append(_decode(data[pos:pos + size]))
+            pos += size
+        (count,) = struct.unpack_from('<I', data, pos)
+        pos += 4
+        imports = []
+        for _ in range(count):
+            name, alias, source, flags = _IMPORT.unpack_from(data, pos)
+            pos += _IMPORT.size
+            imports.append((strings[name],
+                            None if alias == _NONE else strings[alias],
+                            bool(flags & 1), bool(flags & 2),
+                            None if source == _NONE else strings[source]))
+        yield None if status else imports
+        pos = end
+
+
+def encode_request(filenames):
+    """Encode a list of filenames (as bytes) as a binary protocol request."""
+    return b''.join(struct.pack('<I', len(f)) + f for f in filenames)
+
+
+def serve_requests(stdin, stdout, prefilter=False, bytecode=False):
+    """Answer a binary protocol request."""
+    writer = RecordWriter()
+    while True:
+        header = stdin.read(4)
+        if len(header) < 4:
+            break
+        (size,) = struct.unpack('<I', header)
+        filename = _decode_filename(stdin.read(size))
+        try:
+            imports = get_imports(filename, prefilter, bytecode)
+        except Exception as e:
+            sys.stderr.write('%s: %s\n' % (filename, e))
+            imports = None
+        stdout.write(writer.record(imports))
+    stdout.flush()
+
+
 if __name__ == "__main__":
-    # This is used to parse a file with a different python version, launching a
-    # subprocess and communicating with it via reading stdout.
-    filename = sys.argv[1]
-    print_imports(filename)
+    # This is used to parse files with a different python version, launching a
+    # subprocess and communicating with it via stdin and stdout.
+    prefilter = "--prefilter" in sys.argv[1:]
+    if "--binary" in sys.argv[1:]:
+        serve_requests(getattr(sys.stdin, 'buffer', sys.stdin),
+                       getattr(sys.stdout, 'buffer', sys.stdout), prefilter,
+                       "--bytecode" in sys.argv[1:])
+    else:
+        print_imports(sys.argv[1], prefilter)
@@ -0,0 +1,157 @@
+"""Import-time cost analysis with `python -X importtime` measurements.
+
+The log written by `python -X importtime` to stderr has a line per imported
+module:
+  import time: self [us] | cumulative | imported package
+  import time:       153 |        153 |   _io
+  import time:      1170 |       2461 | json
+where the cumulative time includes the modules first imported while importing
+the module. Measurements are attached to the graph nodes of the files with the
+same module name (see resolve.ResolvedFile.module_name), which lets us find
+the chains of imports through which each source file pulls in expensive
+subtrees.
+"""
+
+import collections
+import os
+import subprocess
+
+from . import graph
+from . import resolve
+
+ImportTime = collections.namedtuple('ImportTime', ['self_us', 'cumulative_us'])
+
+
+def parse_log(lines):
+    """Parse a -X importtime log.
+
+    Args:
+      lines: An iterable of lines, e.g. an open log file. Lines that are not
+        import time measurements are ignored.
+
+    Returns:
+      A dict of module name to ImportTime, in microseconds.
+    """
+    out = {}
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            # The header line.
+            continue
+        # Only the first import of a module is measured.
+        out.setdefault(fields[2].strip(), ImportTime(self_us, cumulative_us))
+    return out
+
+
+def run_importtime(python_version, module_names, pythonpath=''):
+    """Import modules in a local interpreter and return its -X importtime log.
+
+    The modules are imported in order in a single process, so modules shared
+    with an earlier import are only measured once. Import errors are ignored.
+
+    Args:
+      python_version: The (major, minor) version of the interpreter to run.
+      module_names: A list of module names.
+      pythonpath: Directories to put in front of the interpreter's
+        PYTHONPATH.
+
+    Returns:
+      A list of log lines.
+    """
+    exe = 'python%d.%d' % tuple(python_version)
+    # importlib.import_module bypasses the import time instrumentation, but
+    # __import__ does not.
+    code = ('for m in %r:\n'
+            '  try:\n'
+            '    __import__(m)\n'
+            '  except BaseException:\n'
+            '    pass\n' % list(module_names))
+    env = dict(os.environ)
+    if pythonpath:
+        env['PYTHONPATH'] = os.pathsep.join(
+            p for p in (pythonpath, env.get('PYTHONPATH')) if p)
+    p = subprocess.Popen([exe, '-X', 'importtime', '-c', code], env=env,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, stderr = p.communicate()
+    return stderr.decode('utf-8', 'replace').splitlines()
+
+
+def _file_time(import_graph, filename, times):
+    f = import_graph.provenance.get(filename)
+    if f is None or not f.module_name:
+        return None
+    return times.get(f.module_name)
+
+
+def attach(import_graph, times):
+    """Attach import times to the nodes of a final graph.
+
+    Measured nodes get 'self_us' and 'cumulative_us' networkx node attributes.
+    For an import cycle these are the sum of its files' self times and the
+    largest cumulative time of any of its files.
+
+    Args:
+      import_graph: An ImportGraph on which build() has been called.
+      times: A dict of module name to ImportTime, e.g. from parse_log().
+
+    Returns:
+      A dict of node to ImportTime, for the measured nodes.
+    """
+    assert import_graph.final, 'Call build() before attaching import times.'
+    out = {}
+    for node in import_graph.graph.nodes:
+        files = node if isinstance(node, graph.NodeSet) else [node]
+        measured = [t for t in (_file_time(import_graph, f, times)
+                                for f in files) if t]
+        if not measured:
+            continue
+        t = ImportTime(sum(t.self_us for t in measured),
+                       max(t.cumulative_us for t in measured))
+        out[node] = t
+        import_graph.graph.nodes[node]['self_us'] = t.self_us
+        import_graph.graph.nodes[node]['cumulative_us'] = t.cumulative_us
+    return out
+
+
+def heaviest_chains(import_graph, node_times, num_imports=3):
+    """Find the most expensive imports of each directly added source file.
+
+    Args:
+      import_graph: An ImportGraph on which build() has been called.
+      node_times: A dict of node to ImportTime, from attach().
+      num_imports: The number of imports to report for each source.
+
+    Returns:
+      A dict of each node containing a Direct source file to a list of up to
+      num_imports chains, heaviest first. A chain starts with one of the
+      source's measured imports and repeatedly follows the import with the
+      largest cumulative time; it is a list of (node, ImportTime) pairs.
+    """
+    g = import_graph.graph
+
+    def measured_deps(node):
+        deps = [d for d in g.successors(node) if d in node_times]
+        return sorted(deps, key=lambda d: -node_times[d].cumulative_us)
+
+    out = {}
+    for node in g.nodes:
+        files = node if isinstance(node, graph.NodeSet) else [node]
+        if not any(isinstance(import_graph.provenance.get(f), resolve.Direct)
+                   for f in files):
+            continue
+        chains = []
+        for dep in measured_deps(node)[:num_imports]:
+            chain = [(dep, node_times[dep])]
+            deps = measured_deps(dep)
+            while deps:
+                chain.append((deps[0], node_times[deps[0]]))
+                deps = measured_deps(deps[0])
+            chains.append(chain)
+        out[node] = chains
+    return out
@@ -0,0 +1,111 @@
+"""Crawling a source tree described by a manifest.
+
+A build system that already knows every source file, and possibly its digest
+and imports, can describe the tree in a manifest so that importlab does not
+walk, stat or re-read it. Manifests are json files:
+  {
+    'root': '/path/to/src',
+    'files': {
+      'pkg/__init__.py': {},
+      'pkg/mod.py': {
+        'digest': 'any string identifying the contents',
+        'imports': [[name, new_name, is_from, is_star, source], ...],
+      },
+    },
+  }
+'root' defaults to the manifest's directory, and 'files' may also be a plain
+list of paths relative to it. Imports use the fields of
+parsepy.ImportStatement, i.e. as found by import_finder for the target python
+version. Digests only need to be consistent within a manifest: files with the
+same digest are parsed once.
+
+Files are resolved through a fs.ManifestFileSystem, and their imports are
+taken from the manifest when given, so the only disk access left is reading
+the files whose imports are not listed.
+"""
+
+import json
+import os
+
+from . import fs
+from . import parsepy
+
+
+class ManifestError(Exception):
+    pass
+
+
+class Manifest(object):
+    """A list of source files, with optional digests and imports.
+
+    Attributes:
+      root: The absolute directory the file paths are relative to.
+      files: The sorted relative paths of the files.
+      digests: A dict of absolute file path to digest.
+      imports: A dict of absolute file path to a list of ImportStatements.
+    """
+
+    def __init__(self, root, files):
+        """Create a manifest.
+
+        Args:
+          root: The directory the file paths are relative to.
+          files: A list of relative file paths, or a dict of relative file
+            path to a dict with optional 'digest' and 'imports' entries.
+
+        Raises:
+          ManifestError: If an entry is malformed.
+        """
+        self.root = os.path.abspath(root)
+        self.digests = {}
+        self.imports = {}
+        if not isinstance(files, dict):
+            files = dict.fromkeys(files)
+        files = {os.path.normpath(f): entry for f, entry in files.items()}
+        for f, entry in files.items():
+            path = os.path.join(self.root, f)
+            entry = entry or {}
+            if 'digest' in entry:
+                self.digests[path] = entry['digest']
+            if 'imports' in entry:
+                try:
+                    self.imports[path] = [parsepy.ImportStatement(*imp)
+                                          for imp in entry['imports']]
+                except TypeError:
+                    raise ManifestError('Bad imports for %s' % f)
+        self.files = sorted(files)
+
+    @classmethod
+    def load(cls, filename):
+        """Read a manifest from a json file."""
+        with open(filename) as f:
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                raise ManifestError('Cannot read %s: %s' % (filename, e))
+        if not isinstance(data, dict) or 'files' not in data:
+            raise ManifestError('No file list in %s' % filename)
+        root = os.path.join(os.path.dirname(os.path.abspath(filename)),
+                            data.get('root', ''))
+        return cls(root, data['files'])
+
+    def filesystem(self):
+        """A fs.ManifestFileSystem with the files of the manifest."""
+        return fs.ManifestFileSystem(self.root, self.files)
+
+    def select(self, paths=None):
+        """The absolute paths of the files in or under some paths.
+
+        Args:
+          paths: A list of files or directories, or None for every file.
+
+        Returns:
+          A sorted list of the matching .py files of the manifest.
+        """
+        files = [os.path.join(self.root, f) for f in self.files
+                 if f.endswith('.py')]
+        if paths is None:
+            return files
+        paths = set(os.path.abspath(p) for p in paths)
+        dirs = tuple(p + os.path.sep for p in paths)
+        return [f for f in files if f in paths or f.startswith(dirs)]
@@ -0,0 +1,87 @@
+"""Analysis of the same source tree for several python versions at once.
+
+create() builds one ImportGraph per target version in a single run. The source
+files are expanded once, and the versions share cached filesystem lookups
+(see fs.CachingFileSystem). Each version is crawled in its own thread, so the
+per-file parsing subprocesses of different versions run in parallel.
+"""
+
+import asyncio
+import collections
+import copy
+import os
+
+from . import async_crawl
+from . import environment
+from . import fs
+from . import graph
+from . import resolve
+
+
+def _edge_key(import_graph, filename):
+    """Identify a file across versions.
+
+    Each interpreter has its own standard library and site-packages, so system
+    files are identified by module name rather than path.
+    """
+    f = import_graph.provenance.get(filename)
+    if isinstance(f, resolve.System) and f.module_name:
+        return f.module_name
+    return filename
+
+
+def create(env, filenames, python_versions, trim=False, jobs=1, **kwargs):
+    """Create a final graph for each python version.
+
+    Args:
+      env: An environment.Environment object, whose path is used for every
+        version. Its python_version is ignored.
+      filenames: An iterable of filenames
+      python_versions: A list of (major, minor) version tuples.
+      trim: Whether to trim the dependencies of builtin and system files.
+      jobs: The number of files to read concurrently for each version.
+      **kwargs: Other options for graph.ImportGraph. A CrawlBudget is copied,
+        so that its limits apply to each version separately.
+
+    Returns:
+      A tuple of
+        an OrderedDict of python version to immutable ImportGraph, and
+        a dict mapping each (importer, imported) file edge that is not present
+        for every version to the sorted list of versions that have it. System
+        files are named by module rather than path in the edges.
+    """
+    import concurrent.futures
+    filenames = [os.path.abspath(f) for f in filenames]
+    path = fs.Path([fs.CachingFileSystem(f) for f in env.path])
+    if kwargs.get('collapse_system'):
+        trim = True
+
+    def crawl(python_version):
+        options = dict(kwargs)
+        if options.get('budget') is not None:
+            options['budget'] = copy.copy(options['budget'])
+        import_graph = graph.ImportGraph(
+            environment.Environment(path, python_version), **options)
+        if jobs > 1:
+            asyncio.run(async_crawl.crawl(import_graph, filenames, trim, jobs))
+        else:
+            for filename in filenames:
+                import_graph.add_file_recursive(filename, trim)
+        # Edges between files, before cycles are collapsed by build().
+        edges = {(_edge_key(import_graph, k), _edge_key(import_graph, v))
+                 for k, v in import_graph.graph.edges}
+        import_graph.build()
+        return import_graph, edges
+
+    with concurrent.futures.ThreadPoolExecutor(len(python_versions)) as ex:
+        results = list(ex.map(crawl, python_versions))
+    graphs = collections.OrderedDict()
+    edge_versions = collections.defaultdict(list)
+    for version, (import_graph, edges) in zip(python_versions, results):
+        graphs[version] = import_graph
+        for edge in edges:
+            edge_versions[edge].append(version)
+    diff = {edge: sorted(versions)
+            for edge, versions in edge_versions.items()
+            if len(versions) < len(python_versions)}
+    return graphs, diff
@@ -1,9 +1,10 @@
 from __future__ import print_function
 
-import networkx as nx
-
 from . import graph
 from . import resolve
+from . import utils
+
+nx = utils.LazyModule('networkx')
 
 
 def inspect_graph(import_graph):
@@ -66,9 +67,13 @@ def print_topological_sort(import_graph):
         print(import_graph.format(node))
 
 
-def formatted_deps_list(import_graph):
+def formatted_deps_list(import_graph, reduced=False):
+    return _format_deps_list(import_graph, import_graph.deps_list(reduced))
+
+
+def _format_deps_list(import_graph, deps_list):
     out = []
-    for node, deps in import_graph.deps_list():
+    for node, deps in deps_list:
         out.append('source: ' + import_graph.format(node))
         if deps:
             out.append('deps:')
@@ -77,6 +82,18 @@ def formatted_deps_list(import_graph):
     return '\n'.join(out)
 
 
+def print_deps_list(import_graph, reduced=False):
+    """Print the dependencies of each node, reporting any removed edges."""
+    deps_list = import_graph.deps_list(reduced)
+    print(_format_deps_list(import_graph, deps_list))
+    if reduced:
+        removed = (import_graph.graph.number_of_edges() -
+                   sum(len(deps) for _, deps in deps_list))
+        print()
+        print('Removed %d of %d edges implied by other dependencies' % (
+            removed, import_graph.graph.number_of_edges()))
+
+
 def print_unresolved_dependencies(import_graph):
     for imp in sorted(import_graph.get_all_unresolved()):
         print(' ', imp.name)
@@ -93,3 +110,62 @@ def maybe_show_unreadable(import_graph):
         print()
         print('Unreadable files:')
         print_unreadable_files(import_graph)
+
+
+def maybe_show_truncated(import_graph):
+    """Only print a truncated files section if the crawl budget ran out."""
+    if import_graph.truncated:
+        print()
+        print('Truncated files (dependencies not read):')
+        for f in sorted(import_graph.truncated):
+            print(' ', f)
+
+
+def print_version_diff(diff):
+    """Print the edges that are only present for some python versions."""
+    for (k, v), versions in sorted(diff.items()):
+        print('  %s -> %s [%s]' % (
+            k, v, ', '.join('%d.%d' % tuple(ver) for ver in versions)))
+
+
+def print_critical_path(import_graph, path, num_cycles=5):
+    """Print a critical_path.CriticalPath report."""
+    print('Critical path (makespan %g):' % path.makespan)
+    for node in path.path:
+        print('  %10g  %s' % (path.weight[node], import_graph.format(node)))
+    cycles = path.top_cycles(num_cycles)
+    if cycles:
+        print()
+        print('Cycles contributing most to the makespan:')
+        for node in cycles:
+            print('  weight %g, slack %g, %d files: %s' % (
+                path.weight[node], path.slack[node], len(node),
+                import_graph.format(node)))
+
+
+def print_package_graph(package_graph):
+    """Print a packages.PackageGraph, importers first."""
+    for node, deps in package_graph.deps_list():
+        print('  %s (%d files)' % (package_graph.format(node),
+                                   len(package_graph.files.get(node, ()))))
+        deps = sorted(deps, key=lambda d: package_graph.format(d[0]))
+        for dep, count in deps:
+            print('    -> %s [%d]' % (package_graph.format(dep), count))
+
+
+def print_import_time_chains(import_graph, chains):
+    """Print the result of importtime.heaviest_chains."""
+    for node in sorted(chains, key=import_graph.format):
+        print(format_node(import_graph, node, 0))
+        for chain in chains[node]:
+            print('  ' + ' -> '.join(
+                '%s (%.1f ms)' % (_module_name(import_graph, n),
+                                  t.cumulative_us / 1000.0)
+                for n, t in chain))
+
+
+def _module_name(import_graph, node):
+    if isinstance(node, graph.NodeSet):
+        names = sorted(_module_name(import_graph, f) for f in node)
+        return 'cycle{%s, ... %d modules}' % (names[0], len(names))
+    return import_graph.provenance[node].module_name or node
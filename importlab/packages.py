@@ -0,0 +1,126 @@
+"""Aggregation of a dependency graph into a graph of packages.
+
+PackageGraph groups the files of a DependencyGraph by the dotted prefix of
+their package name (see resolve.ResolvedFile.package_name), e.g. with a depth
+of 1 every file under numpy/ becomes the single node 'numpy'. Each package
+edge counts the file edges it stands for, and import cycles between packages
+are condensed into NodeSets of package names, like build() does for files.
+
+The package graph is built in a constant number of linear passes over the
+file graph: one to count the package edges, one to find the package-level
+strongly connected components, and one to condense them.
+"""
+
+import collections
+
+from . import graph
+from . import utils
+
+nx = utils.LazyModule('networkx')
+
+
+def package_key(resolved, depth=None):
+    """The package that a resolved file is grouped into.
+
+    Args:
+      resolved: A resolve.ResolvedFile, or None.
+      depth: The maximum number of components of the dotted package name, or
+        None for the whole package name.
+
+    Returns:
+      A dotted package name, or None if the file's module name is unknown or
+      relative. A top-level module is its own package.
+    """
+    if resolved is None:
+        return None
+    name = resolved.package_name or resolved.module_name
+    if not name or name.startswith('.'):
+        return None
+    if depth is not None:
+        name = '.'.join(name.split('.')[:depth])
+    return name
+
+
+class PackageGraph(object):
+    """The package-level dependencies of a DependencyGraph.
+
+    Attributes:
+      graph: A networkx DiGraph whose nodes are package names, or NodeSets of
+        package names for import cycles between packages. Each edge has a
+        'count' attribute: the number of file edges it stands for.
+      packages: A dict of file to the package name it was grouped into. Files
+        without a module name are their own package, named by their path.
+      files: A dict of each node of `graph` to the sorted list of its files.
+    """
+
+    def __init__(self, dependency_graph, depth=None):
+        """Aggregate a dependency graph.
+
+        Args:
+          dependency_graph: A DependencyGraph, built or not. The edges inside
+            the import cycles collapsed by build() are no longer known, so for
+            a built graph each edge from or to a cycle of files is counted
+            once, and attributed to the package of the cycle's first file.
+          depth: The number of components of the dotted package names to group
+            files by, or None for the whole package name.
+        """
+        provenance = dependency_graph.provenance
+        self.packages = {}
+        # The package of each node of the file graph. Files in a cycle are
+        # grouped under the package of the cycle's first file, and the packages
+        # of the cycle are linked so that they end up in the same component.
+        node_package = {}
+        g = nx.DiGraph()
+        for node in dependency_graph.graph.nodes:
+            files = node if isinstance(node, graph.NodeSet) else [node]
+            keys = []
+            for f in files:
+                key = package_key(provenance.get(f), depth) or f
+                self.packages[f] = key
+                keys.append(key)
+            g.add_nodes_from(keys)
+            node_package[node] = keys[0]
+            g.add_edges_from((k, v) for k, v in zip(keys, keys[1:] + keys[:1])
+                             if k != v)
+        counts = collections.Counter(
+            (node_package[k], node_package[v])
+            for k, v in dependency_graph.graph.edges)
+        for k, v in [edge for edge in counts if edge[0] == edge[1]]:
+            del counts[k, v]
+        g.add_edges_from(counts)
+        self.graph = nx.DiGraph()
+        component = {}
+        for scc in nx.strongly_connected_components(g):
+            node = graph.NodeSet(scc) if len(scc) > 1 else next(iter(scc))
+            self.graph.add_node(node)
+            for key in scc:
+                component[key] = node
+        condensed = collections.Counter()
+        for (k, v), count in counts.items():
+            k, v = component[k], component[v]
+            if k is not v:
+                condensed[k, v] += count
+        self.graph.add_edges_from(
+            (k, v, {'count': count}) for (k, v), count in condensed.items())
+        files = collections.defaultdict(list)
+        for f, key in self.packages.items():
+            files[component[key]].append(f)
+        self.files = {node: sorted(fs) for node, fs in files.items()}
+
+    def format(self, node):
+        if isinstance(node, graph.NodeSet):
+            return node.pp()
+        else:
+            return node
+
+    def deps_list(self):
+        """Returns a list of (package, [(dependency, count)]).
+
+        Packages come before the packages they depend on.
+        """
+        out = []
+        for node in nx.topological_sort(self.graph):
+            deps = [(v, count) for _, v, count
+                    in self.graph.out_edges([node], data='count')]
+            out.append((node, deps))
+        return out
@@ -16,6 +16,7 @@
 
 import collections
 import logging
+import os
 import sys
 
 from . import import_finder
@@ -73,27 +74,82 @@ class ImportStatement(collections.namedtuple(
             return 'import ' + module
 
 
-def get_imports(filename, python_version):
+def get_imports(filename, python_version, prefilter=False, bytecode=False):
     if python_version == sys.version_info[0:2]:
         # Invoke import_finder directly
         try:
-            imports = import_finder.get_imports(filename)
+            imports = import_finder.get_imports(filename, prefilter, bytecode)
         except Exception:
             raise ParseError(filename)
     else:
-        # Call the appropriate python version in a subprocess
-        f = sys.modules['importlab.import_finder'].__file__
-        if f.rsplit('.', 1)[-1] == 'pyc':
-            # In host Python 2, importlab ships with .pyc files.
-            f = f[:-1]
-        ret, stdout, stderr = utils.run_py_file(python_version, f, filename)
-        if not ret:
-            if sys.version_info[0] == 3:
-                stdout = stdout.decode('ascii')
-            imports = import_finder.read_imports(stdout)
-        else:
-            if sys.version_info[0] == 3:
-                stderr = stderr.decode('ascii')
-            logging.info(stderr)
-            raise ParseError(filename)
+        (imports,) = get_imports_batch(
+            [filename], python_version, prefilter, bytecode)
+        if isinstance(imports, ParseError):
+            raise imports
+        return imports
     return [ImportStatement(*imp) for imp in imports]
+
+
+def get_imports_batch(filenames, python_version, prefilter=False,
+                      bytecode=False):
+    """Get the imports of several files.
+
+    With a python version other than the host's, all the files are parsed in a
+    single subprocess, which reports the results in the binary protocol
+    described in import_finder.py.
+
+    Args:
+      filenames: A list of filenames.
+      python_version: The (major, minor) python version of the files.
+      prefilter: See import_finder.get_imports.
+      bytecode: See import_finder.get_imports.
+
+    Returns:
+      A list with, for each file, a list of ImportStatements or a ParseError.
+    """
+    if python_version == sys.version_info[0:2]:
+        out = []
+        for filename in filenames:
+            try:
+                out.append(get_imports(
+                    filename, python_version, prefilter, bytecode))
+            except ParseError as e:
+                out.append(e)
+        return out
+    # Call the appropriate python version in a subprocess
+    f = sys.modules['importlab.import_finder'].__file__
+    if f.rsplit('.', 1)[-1] == 'pyc':
+        # In host Python 2, importlab ships with .pyc files.
+        f = f[:-1]
+    args = ['--binary']
+    if prefilter:
+        args.append('--prefilter')
+    if bytecode:
+        args.append('--bytecode')
+    request = import_finder.encode_request(
+        [os.fsencode(filename) for filename in filenames])
+    ret, stdout, stderr = utils.run_py_file(
+        python_version, f, *args, stdin=request)
+    if stderr:
+        logging.info(stderr.decode('utf-8', 'replace'))
+    out = []
+    for filename, imports in zip(filenames,
+                                 import_finder.read_records(stdout)):
+        if imports is None:
+            out.append(ParseError(filename))
+        else:
+            out.append([ImportStatement(*imp) for imp in imports])
+    missing = filenames[len(out):]
+    if len(filenames) == 1:
+        out.extend(ParseError(filename) for filename in missing)
+    else:
+        # The subprocess failed part way through the batch, e.g. it crashed
+        # on one file. Parse the rest one at a time, so that only the files
+        # that cannot be parsed fail.
+        for filename in missing:
+            try:
+                out.append(get_imports(
+                    filename, python_version, prefilter, bytecode))
+            except ParseError as e:
+                out.append(e)
+    return out
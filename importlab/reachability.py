@@ -0,0 +1,153 @@
+"""Transitive reachability queries over a built dependency graph.
+
+ReachabilityIndex precomputes the dependency closure of every node of the
+condensed DAG produced by DependencyGraph.build() in a single pass in reverse
+topological order, storing each closure as a bitset. Queries such as "does A
+transitively depend on B?" are then a single bit test.
+
+Nodes are numbered so that every node's dependencies have lower numbers than
+the node itself, so the bitset for node i needs at most i + 1 bits; the total
+size is bounded by n^2/16 bytes for n nodes, and is usually far smaller.
+
+The same closures give the transitive reduction of the graph: the edges that
+are not implied by a longer path (see transitive_reduction).
+"""
+
+import sys
+
+from . import graph
+from . import utils
+
+nx = utils.LazyModule('networkx')
+
+
+class ReachabilityError(Exception):
+    pass
+
+
+def _has_bit(closure, j):
+    return j >> 3 < len(closure) and bool(closure[j >> 3] & (1 << (j & 7)))
+
+
+class ReachabilityIndex(object):
+    """Precomputed transitive closures of a final DependencyGraph."""
+
+    def __init__(self, dependency_graph, max_bytes=None):
+        """Build the index.
+
+        Args:
+          dependency_graph: A DependencyGraph on which build() has been called.
+          max_bytes: If set, raise ReachabilityError rather than use more than
+            this many bytes for the closure bitsets.
+        """
+        assert dependency_graph.final, 'Call build() before indexing the graph.'
+        g = dependency_graph.graph
+        # Reverse topological order: dependencies come before their importers.
+        self.nodes = list(reversed(list(nx.topological_sort(g))))
+        self._index = {node: i for i, node in enumerate(self.nodes)}
+        # Map each file to the node (itself or a NodeSet) that contains it.
+        self._containing_node = {}
+        for node in self.nodes:
+            if isinstance(node, graph.NodeSet):
+                for f in node:
+                    self._containing_node[f] = node
+            else:
+                self._containing_node[node] = node
+        # Closures are built as python ints, which are cheap to OR together,
+        # and then stored as little-endian bytes, which allow testing a single
+        # bit without shifting the whole int.
+        self._closures = []
+        self.memory_bytes = 0
+        for i, node in enumerate(self.nodes):
+            closure = 1 << i
+            for dep in g.successors(node):
+                closure |= self._closures[self._index[dep]]
+            self._closures.append(closure)
+            self.memory_bytes += sys.getsizeof(closure)
+            if max_bytes is not None and self.memory_bytes > max_bytes:
+                raise ReachabilityError(
+                    'Reachability index exceeds %d bytes after %d of %d nodes'
+                    % (max_bytes, i + 1, len(self.nodes)))
+        self.memory_bytes = 0
+        for i, closure in enumerate(self._closures):
+            closure = closure.to_bytes((closure.bit_length() + 7) // 8,
+                                       'little')
+            self._closures[i] = closure
+            self.memory_bytes += sys.getsizeof(closure)
+
+    def _node(self, x):
+        """Map a file or node to its node in the condensed graph."""
+        if isinstance(x, graph.NodeSet):
+            return x
+        try:
+            return self._containing_node[x]
+        except KeyError:
+            raise ReachabilityError('Not in the graph: %s' % x)
+
+    def depends_on(self, a, b):
+        """Whether a transitively depends on b.
+
+        Files in the same import cycle depend on each other (and themselves).
+        """
+        a, b = self._node(a), self._node(b)
+        if a is b:
+            return isinstance(a, graph.NodeSet)
+        return _has_bit(self._closures[self._index[a]], self._index[b])
+
+    def closure_nodes(self, x):
+        """The nodes x transitively depends on, including x's own node."""
+        bits = int.from_bytes(self._closures[self._index[self._node(x)]],
+                              'little')
+        out = []
+        while bits:
+            low = bits & -bits
+            out.append(self.nodes[low.bit_length() - 1])
+            bits ^= low
+        return out
+
+    def closure(self, x):
+        """The set of files that x transitively depends on.
+
+        x itself is only included if it is part of an import cycle.
+        """
+        out = set()
+        for node in self.closure_nodes(x):
+            if isinstance(node, graph.NodeSet):
+                out.update(node)
+            else:
+                out.add(node)
+        if not isinstance(self._node(x), graph.NodeSet):
+            out.discard(x)
+        return out
+
+
+def transitive_reduction(dependency_graph, index=None):
+    """Find the redundant edges of a final DependencyGraph.
+
+    An edge a -> b is redundant if a also depends on b through another of its
+    dependencies. Removing every redundant edge leaves the smallest graph with
+    the same reachability. A node's dependencies are visited from the highest
+    number down, so any dependency that reaches b is visited before b itself,
+    and b is redundant iff it is in the closure of an earlier kept dependency.
+
+    Args:
+      dependency_graph: A DependencyGraph on which build() has been called.
+      index: An optional ReachabilityIndex of the graph, to save rebuilding it.
+
+    Returns:
+      A set of (importer, dependency) edges.
+    """
+    if index is None:
+        index = ReachabilityIndex(dependency_graph)
+    g = dependency_graph.graph
+    redundant = set()
+    for node in index.nodes:
+        kept = []
+        for dep in sorted(g.successors(node), key=index._index.get,
+                          reverse=True):
+            j = index._index[dep]
+            if any(_has_bit(closure, j) for closure in kept):
+                redundant.add((node, dep))
+            else:
+                kept.append(index._closures[j])
+    return redundant
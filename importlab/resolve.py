@@ -27,36 +27,105 @@ class ImportException(ImportError):
         self.module_name = module_name
 
 
+# Suffixes of extension modules, on any platform or python version.
+EXTENSION_SUFFIXES = ('.so', '.pyd')
+
+# Suffixes of importable files that are not python source. These are treated
+# as leaves of the import graph and never read.
+NON_SOURCE_SUFFIXES = EXTENSION_SUFFIXES + ('.pyc', '.pyo')
+
+
+def is_source_path(path):
+    """Whether a file may contain python source with imports to follow."""
+    return not path.endswith(NON_SOURCE_SUFFIXES)
+
+
+# Marks a derived field of a ResolvedFile that has not been computed yet.
+_UNSET = object()
+
+
 class ResolvedFile(object):
+    """Where an import was resolved to.
+
+    ResolvedFiles are immutable and hashable, so identical resolutions can be
+    shared. Derived fields (package_name, short_path) are computed on first
+    access and cached.
+    """
+
+    __slots__ = ('path', 'module_name', '_package_name', '_short_path')
+
     def __init__(self, path, module_name):
-        self.path = path
-        self.module_name = module_name
+        object.__setattr__(self, 'path', path)
+        object.__setattr__(self, 'module_name', module_name)
+        object.__setattr__(self, '_package_name', _UNSET)
+        object.__setattr__(self, '_short_path', _UNSET)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is immutable' % self.__class__.__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError('%s is immutable' % self.__class__.__name__)
+
+    def __reduce__(self):
+        # The default pickle and copy protocols restore slots with setattr,
+        # so rebuild the object through its constructor instead.
+        return (self.__class__, (self.path, self.module_name))
+
+    def _key(self):
+        return (self.__class__, self.path, self.module_name)
+
+    def __eq__(self, other):
+        if not isinstance(other, ResolvedFile):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return '%s(%r, %r)' % (
+            self.__class__.__name__, self.path, self.module_name)
 
     def is_extension(self):
-        return self.path.endswith('.so')
+        return self.path.endswith(EXTENSION_SUFFIXES)
+
+    def is_source(self):
+        return is_source_path(self.path)
 
     @property
     def package_name(self):
-        f, _ = os.path.splitext(self.path)
-        if f.endswith('__init__'):
-            return self.module_name
-        elif '.' in self.module_name:
-            return self.module_name[:self.module_name.rindex('.')]
-        else:
-            return None
+        if self._package_name is _UNSET:
+            f, _ = os.path.splitext(self.path)
+            if f.endswith('__init__'):
+                package_name = self.module_name
+            elif '.' in self.module_name:
+                package_name = self.module_name[:self.module_name.rindex('.')]
+            else:
+                package_name = None
+            object.__setattr__(self, '_package_name', package_name)
+        return self._package_name
 
     @property
     def short_path(self):
-        parts = self.path.split(os.path.sep)
-        n = self.module_name.count('.')
-        if parts[-1] == '__init__.py':
-            n += 1
-        parts = parts[-(n+1):]
-        return os.path.join(*parts)
+        if self._short_path is _UNSET:
+            parts = self.path.split(os.path.sep)
+            n = self.module_name.count('.')
+            if parts[-1] == '__init__.py':
+                n += 1
+            parts = parts[-(n+1):]
+            object.__setattr__(self, '_short_path', os.path.join(*parts))
+        return self._short_path
 
 
 class Direct(ResolvedFile):
     """Files added directly as arguments."""
+
+    __slots__ = ()
+
     def __init__(self, path, module_name=''):
         # We do not necessarily have a module name for a directly added file.
         super(Direct, self).__init__(path, module_name)
@@ -65,17 +134,99 @@ class Direct(ResolvedFile):
 class Builtin(ResolvedFile):
     """Imports that are resolved via python's builtins."""
 
+    __slots__ = ()
+
 
 class System(ResolvedFile):
     """Imports that are resolved by python."""
-    pass
+
+    __slots__ = ()
 
 
 class Local(ResolvedFile):
     """Imports that are found in a local pythonpath."""
+
+    __slots__ = ('fs',)
+
     def __init__(self, path, module_name, fs):
         super(Local, self).__init__(path, module_name)
-        self.fs = fs
+        object.__setattr__(self, 'fs', fs)
+
+    def __reduce__(self):
+        return (self.__class__, (self.path, self.module_name, self.fs))
+
+    def _key(self):
+        return (self.__class__, self.path, self.module_name, self.fs)
+
+    def __repr__(self):
+        return '%s(%r, %r, %r)' % (
+            self.__class__.__name__, self.path, self.module_name, self.fs)
+
+
+_KINDS = {cls.__name__: cls for cls in (Direct, Builtin, System, Local)}
+
+
+def dump_provenance(resolved, fs_path):
+    """Convert a ResolvedFile to a json-compatible list.
+
+    Args:
+      resolved: A ResolvedFile
+      fs_path: The list of filesystems the file was resolved against.
+
+    Returns:
+      A list of [kind, path, module_name, fs_index], where fs_index is the index
+      of a Local file's filesystem in fs_path and None for other kinds.
+
+    Raises:
+      ValueError: If a Local file's filesystem is not in fs_path.
+    """
+    fs_index = None
+    if isinstance(resolved, Local):
+        for i, fs in enumerate(fs_path):
+            if fs is resolved.fs:
+                fs_index = i
+                break
+        else:
+            raise ValueError('Filesystem of %s is not in the path' %
+                             resolved.path)
+    return [resolved.__class__.__name__, resolved.path, resolved.module_name,
+            fs_index]
+
+
+def load_provenance(data, fs_path):
+    """Inverse of dump_provenance."""
+    kind, path, module_name, fs_index = data
+    cls = _KINDS[kind]
+    if cls is Local:
+        return cls(path, module_name, fs_path[fs_index])
+    return cls(path, module_name)
+
+
+def top_level_package(resolved):
+    """Collapse a resolved module into its top-level package.
+
+    e.g. System('/site/numpy/core/multiarray.py', 'numpy.core.multiarray')
+    becomes System('/site/numpy', 'numpy').
+
+    Returns:
+      A ResolvedFile of the same kind whose path is the top-level package
+      directory, or `resolved` itself if it already is a top-level module or its
+      path does not match its module name.
+    """
+    name = resolved.module_name
+    if not name or name.startswith('.'):
+        return resolved
+    parts = resolved.path.split(os.path.sep)
+    n = name.count('.')
+    if os.path.splitext(parts[-1])[0] == '__init__':
+        n += 1
+    if n == 0 or len(parts) <= n + 1:
+        return resolved
+    top = name.split('.', 1)[0]
+    if parts[-(n + 1)] != top:
+        return resolved
+    path = os.path.sep.join(parts[:-n])
+    return resolved.__class__(path, top)
 
 
 def convert_to_path(name):
@@ -136,14 +287,40 @@ class Resolver:
         self.fs_path = fs_path
         self.current_module = current_module
         self.current_directory = os.path.dirname(current_module.path)
+        # Memoized filesystem probes and module paths. A resolver is used for
+        # the imports of a single file, so statements such as
+        # `from pkg import a, b` share the probes for `pkg`.
+        self._found_files = {}
+        self._module_paths = {}
 
     def _find_file(self, fs, name):
-        init = os.path.join(name, '__init__.py')
-        py = name + '.py'
-        for x in [init, py]:
-            if fs.isfile(x):
-                return fs.refer_to(x)
-        return None
+        key = (fs, name)
+        if key not in self._found_files:
+            self._found_files[key] = self._probe_file(fs, name)
+        return self._found_files[key]
+
+    def _probe_file(self, fs, name):
+        find_module = getattr(fs, 'find_module', None)
+        if find_module is not None:
+            x = find_module(name)
+        else:
+            # A duck-typed filesystem such as fs.TarFileSystem, which only has
+            # the probes of fs.FileSystem.find_module.
+            x = next((x for x in (os.path.join(name, '__init__.py'),
+                                  name + '.py') if fs.isfile(x)), None)
+        return fs.refer_to(x) if x else None
+
+    def _module_path(self, name):
+        """Convert a module name to a path, relative to the current file."""
+        if name not in self._module_paths:
+            filename, level = convert_to_path(name)
+            if level:
+                # This is a relative import; we need to resolve the filename
+                # relative to the importing file path.
+                filename = os.path.normpath(
+                    os.path.join(self.current_directory, filename))
+            self._module_paths[name] = filename
+        return self._module_paths[name]
 
     def resolve_import(self, item):
         """Simulate how Python resolves imports.
@@ -178,12 +355,7 @@ class Resolver:
             filename = name + '.so'
             return Builtin(filename, name)
 
-        filename, level = convert_to_path(name)
-        if level:
-            # This is a relative import; we need to resolve the filename
-            # relative to the importing file path.
-            filename = os.path.normpath(
-                os.path.join(self.current_directory, filename))
+        filename = self._module_path(name)
 
         if not short_name:
             try_filename = True
@@ -247,6 +419,29 @@ class Resolver:
 
         raise ImportException(name)
 
+    def resolve_imports(self, import_items):
+        """Resolve all the imports of a file in one pass.
+
+        Identical statements are only resolved once, and filesystem probes are
+        shared between statements (see _find_file).
+
+        Args:
+            import_items: A list of ImportStatements
+
+        Returns:
+            A list with a ResolvedFile or an ImportException for each item.
+        """
+        results = {}
+        out = []
+        for item in import_items:
+            if item not in results:
+                try:
+                    results[item] = self.resolve_import(item)
+                except ImportException as err:
+                    results[item] = err
+            out.append(results[item])
+        return out
+
     def resolve_all(self, import_items):
         """Resolves a list of imports.
 
@@ -0,0 +1,160 @@
+"""Dynamic scheduling of work over a built dependency graph.
+
+Scheduler hands out each node of the condensed graph (a file or a NodeSet) as
+soon as all of its dependencies have been marked done, rather than level by
+level, so one slow file only holds back the files that import it. Among ready
+nodes, the one with the longest (or, given weights, heaviest) chain of
+importers waiting on it is handed out first.
+
+A scheduler is safe to use from several threads. Work done in other processes
+is reported by calling done() from the thread that collects the results, as
+run() does for a concurrent.futures executor.
+"""
+
+import heapq
+import threading
+
+from . import critical_path
+from . import utils
+
+nx = utils.LazyModule('networkx')
+
+
+class Scheduler(object):
+    """Hands out the nodes of a final DependencyGraph in dependency order."""
+
+    def __init__(self, dependency_graph, weights=None):
+        """Set up the scheduler.
+
+        Args:
+          dependency_graph: A DependencyGraph on which build() has been called.
+          weights: An optional dict of file path to cost (see critical_path.py)
+            for measuring chains of importers. By default every node costs 1.
+        """
+        assert dependency_graph.final, 'Call build() before scheduling.'
+        g = dependency_graph.graph
+        # Importers come before their dependencies in topological order, so
+        # walking it computes each node's heaviest chain of importers, counting
+        # the node itself.
+        order = list(nx.topological_sort(g))
+        self.priority = {}
+        for node in order:
+            weight = (1 if weights is None
+                      else critical_path.node_weight(node, weights))
+            self.priority[node] = weight + max(
+                (self.priority[k] for k in g.predecessors(node)), default=0)
+        self._importers = {node: list(g.predecessors(node)) for node in order}
+        # Ties are broken by topological order, so scheduling is deterministic.
+        self._rank = {node: i for i, node in enumerate(reversed(order))}
+        # The number of unfinished dependencies of each node not yet ready.
+        self._waiting = {}
+        # Heap of (-priority, rank, node) for ready nodes.
+        self._ready = []
+        for node in reversed(order):
+            count = g.out_degree(node)
+            if count:
+                self._waiting[node] = count
+            else:
+                self._push(node)
+        # Nodes that have not been handed out yet, and that are not done.
+        self._undispatched = len(order)
+        self._unfinished = len(order)
+        # Set by run() when a call fails, to stop handing out nodes.
+        self._failed = False
+        self._cond = threading.Condition()
+
+    def _push(self, node):
+        heapq.heappush(
+            self._ready, (-self.priority[node], self._rank[node], node))
+
+    def __len__(self):
+        """The number of nodes that have not been marked done."""
+        return self._unfinished
+
+    def get(self, block=True, timeout=None):
+        """Return the ready node with the highest priority.
+
+        Args:
+          block: Whether to wait for a node to become ready.
+          timeout: The maximum time to wait, in seconds.
+
+        Returns:
+          A node, or None if every node has been handed out, if no node
+          became ready in time, or if a call in run() failed.
+        """
+        with self._cond:
+            if block:
+                self._cond.wait_for(
+                    lambda: (self._ready or not self._undispatched or
+                             self._failed), timeout)
+            if self._failed or not self._ready:
+                return None
+            self._undispatched -= 1
+            return heapq.heappop(self._ready)[2]
+
+    def done(self, node):
+        """Mark a node as finished, making its importers ready if possible."""
+        with self._cond:
+            self._unfinished -= 1
+            for importer in self._importers[node]:
+                self._waiting[importer] -= 1
+                if not self._waiting[importer]:
+                    del self._waiting[importer]
+                    self._push(importer)
+            self._cond.notify_all()
+
+    def __iter__(self):
+        """Yield every node, waiting for nodes to become ready.
+
+        The caller must mark each node as done, possibly from another thread.
+        """
+        while True:
+            node = self.get()
+            if node is None:
+                return
+            yield node
+
+    def run(self, executor, fn):
+        """Call fn on every node, in dependency order, using an executor.
+
+        Args:
+          executor: A concurrent.futures.Executor.
+          fn: A function of one node. With a process pool it must be picklable,
+            and it receives a copy of the node.
+
+        Returns:
+          A dict of node to the result of fn.
+
+        Raises:
+          The first exception raised by fn, once the running calls finish.
+          Nodes that depend on a failed node are not run.
+        """
+        results = {}
+        errors = []
+
+        def on_done(node, future):
+            error = future.exception()
+            if error is not None:
+                with self._cond:
+                    errors.append(error)
+                    # Wake up get() so that run() can stop.
+                    self._failed = True
+                    self._cond.notify_all()
+                return
+            results[node] = future.result()
+            self.done(node)
+
+        futures = []
+        while not errors:
+            node = self.get()
+            if node is None:
+                break
+            future = executor.submit(fn, node)
+            future.add_done_callback(
+                lambda future, node=node: on_done(node, future))
+            futures.append(future)
+        for future in futures:
+            future.exception()
+        if errors:
+            raise errors[0]
+        return results
@@ -0,0 +1,199 @@
+"""Sharded construction of import graphs.
+
+A large tree can be crawled in several shards, each handling a subset of the
+source files, e.g. in separate processes or CI jobs. Each shard records its
+unbuilt graph as a partial snapshot, and merge() unions the snapshots and builds
+the final graph once.
+
+Snapshots are plain json-compatible dicts:
+  {
+    'version': 1,
+    'sources': [filename, ...],
+    'nodes': [filename, ...],
+    'edges': [[from, to], ...],
+    'broken_deps': {filename: [[import statement fields], ...]},
+    'unreadable_files': [filename, ...],
+    'truncated': [filename, ...],
+    'provenance': {filename: [kind, path, module_name, fs_index]},
+  }
+with provenance entries as produced by resolve.dump_provenance. 'truncated'
+lists the files whose dependencies a crawl budget left unread, and may be
+missing from older snapshots.
+"""
+
+import json
+import os
+
+from . import graph
+from . import parsepy
+from . import resolve
+
+SNAPSHOT_VERSION = 1
+
+# The order of preference for the provenance of a file that shards resolved
+# differently.
+_PROVENANCE_RANK = {'Direct': 0, 'Local': 1, 'System': 2, 'Builtin': 3}
+
+
+class ShardError(Exception):
+    pass
+
+
+def shard_files(filenames, num_shards, index):
+    """Return the subset of filenames handled by shard `index`.
+
+    The split is deterministic and independent of the order of filenames.
+    """
+    if not 0 <= index < num_shards:
+        raise ShardError('Shard index %d out of range for %d shards' % (
+            index, num_shards))
+    return sorted(set(filenames))[index::num_shards]
+
+
+def _dump_import(imp):
+    if isinstance(imp, parsepy.ImportStatement):
+        return list(imp)
+    return imp
+
+
+def _load_import(data):
+    if isinstance(data, list):
+        return parsepy.ImportStatement(*data)
+    return data
+
+
+def get_partial(import_graph):
+    """Snapshot an unbuilt graph."""
+    assert not import_graph.final, 'Cannot snapshot a built graph.'
+    env = import_graph.env
+    return {
+        'version': SNAPSHOT_VERSION,
+        'sources': sorted(import_graph.sources),
+        'nodes': sorted(import_graph.graph.nodes),
+        'edges': sorted([k, v] for k, v in import_graph.graph.edges),
+        'broken_deps': {
+            k: [_dump_import(imp) for imp in sorted(v, key=repr)]
+            for k, v in import_graph.broken_deps.items() if v},
+        'unreadable_files': sorted(import_graph.unreadable_files),
+        'truncated': sorted(import_graph.truncated),
+        'provenance': {
+            k: resolve.dump_provenance(v, env.path)
+            for k, v in sorted(import_graph.provenance.items())},
+    }
+
+
+def build_partial(env, filenames, trim=False, **kwargs):
+    """Crawl a shard of the source files and snapshot the result.
+
+    Args:
+      env: An environment.Environment object
+      filenames: The source files handled by this shard.
+      trim: Whether to trim the dependencies of builtin and system files.
+      **kwargs: Other options for graph.ImportGraph.
+
+    Returns:
+      A partial snapshot.
+    """
+    import_graph = graph.ImportGraph(env, **kwargs)
+    if kwargs.get('collapse_system'):
+        trim = True
+    for filename in filenames:
+        import_graph.add_file_recursive(os.path.abspath(filename), trim)
+    return get_partial(import_graph)
+
+
+def save_partial(partial, filename):
+    with open(filename, 'w') as f:
+        json.dump(partial, f)
+
+
+def load_partial(filename):
+    with open(filename) as f:
+        partial = json.load(f)
+    if partial.get('version') != SNAPSHOT_VERSION:
+        raise ShardError('Unsupported snapshot version in %s' % filename)
+    return partial
+
+
+def _provenance_key(data):
+    """Sort key for dumped provenance, most preferred first."""
+    kind, path, module_name, fs_index = data
+    return (_PROVENANCE_RANK[kind], path, module_name,
+            -1 if fs_index is None else fs_index)
+
+
+def merge(env, partials, **kwargs):
+    """Union partial snapshots and build the final graph.
+
+    The result does not depend on the order of the partials. Nodes and edges
+    are added in sorted order, and a file whose provenance differs between
+    shards takes the most specific one: Direct, then Local, then System, with
+    ties broken by path, module name and filesystem index. A file is only
+    truncated if no shard read its dependencies.
+
+    Args:
+      env: An environment.Environment object
+      partials: A list of partial snapshots.
+      **kwargs: Other options for graph.ImportGraph.
+
+    Returns:
+      An immutable ImportGraph.
+    """
+    import_graph = graph.ImportGraph(env, **kwargs)
+    nodes = set()
+    edges = set()
+    provenance = {}
+    truncated = set()
+    # Files that some shard added without truncating them.
+    complete = set()
+    for partial in partials:
+        import_graph.sources.update(partial['sources'])
+        nodes.update(partial['nodes'])
+        edges.update(tuple(e) for e in partial['edges'])
+        for k, v in partial['broken_deps'].items():
+            import_graph.broken_deps[k].update(_load_import(imp) for imp in v)
+        import_graph.unreadable_files.update(partial['unreadable_files'])
+        partial_truncated = set(partial.get('truncated', ()))
+        truncated |= partial_truncated
+        complete.update(n for n in partial['nodes']
+                        if n not in partial_truncated)
+        for k, v in partial['provenance'].items():
+            if k not in provenance or (
+                    _provenance_key(v) < _provenance_key(provenance[k])):
+                provenance[k] = v
+    for k, v in sorted(provenance.items()):
+        import_graph.provenance[k] = resolve.load_provenance(v, env.path)
+    import_graph.truncated = truncated - complete
+    import_graph.non_source_files.update(
+        n for n in nodes if not resolve.is_source_path(n))
+    import_graph.graph.add_nodes_from(sorted(nodes))
+    import_graph.graph.add_edges_from(sorted(edges))
+    import_graph.build()
+    return import_graph
+
+
+def _build_partial_for_pool(args):
+    env, filenames, trim, kwargs = args
+    return build_partial(env, filenames, trim, **kwargs)
+
+
+def build_sharded(env, filenames, num_shards, trim=False, **kwargs):
+    """Build a graph by crawling shards in parallel local processes.
+
+    Args:
+      env: An environment.Environment object
+      filenames: A list of filenames
+      num_shards: The number of shards (and worker processes).
+      trim: Whether to trim the dependencies of builtin and system files.
+      **kwargs: Other options for graph.ImportGraph.
+
+    Returns:
+      An immutable ImportGraph, equivalent to graph.ImportGraph.create().
+    """
+    import concurrent.futures
+    filenames = [os.path.abspath(f) for f in filenames]
+    jobs = [(env, shard_files(filenames, num_shards, i), trim, kwargs)
+            for i in range(num_shards)]
+    with concurrent.futures.ProcessPoolExecutor(num_shards) as executor:
+        partials = list(executor.map(_build_partial_for_pool, jobs))
+    return merge(env, partials, **kwargs)
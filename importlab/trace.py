@@ -0,0 +1,94 @@
+"""Timeline traces of a crawl, in the Chrome trace event format.
+
+A Tracer records spans such as the parse of each file, the resolution of its
+imports, subprocess round trips and the condensation of import cycles, with
+the thread that ran them, so that stragglers and idle workers in a concurrent
+crawl are visible. Saved traces can be opened in Perfetto (ui.perfetto.dev) or
+chrome://tracing.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+class Tracer(object):
+    """Records complete ('X') trace events, from any thread."""
+
+    def __init__(self):
+        self.events = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        # Map of thread id to thread name, for the trace's metadata.
+        self._threads = {}
+
+    def _us(self, t):
+        return (t - self._start) * 1e6
+
+    def add_span(self, name, category, start, end, args=None):
+        """Record a span.
+
+        Args:
+          name: The name of the span, e.g. 'parse'.
+          category: A comma-separated list of categories, e.g. 'crawl'.
+          start: The time.perf_counter() at the start of the span.
+          end: The time.perf_counter() at the end of the span.
+          args: An optional json-compatible dict shown with the span.
+        """
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': self._us(start),
+            'dur': (end - start) * 1e6,
+            'pid': os.getpid(),
+            'tid': thread.ident,
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+            self._threads.setdefault(thread.ident, thread.name)
+
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        """Record the span of a with statement."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start, time.perf_counter(), args)
+
+    def to_json(self):
+        """The trace, as a json-compatible dict."""
+        with self._lock:
+            metadata = [{
+                'name': 'thread_name',
+                'ph': 'M',
+                'pid': os.getpid(),
+                'tid': tid,
+                'args': {'name': name},
+            } for tid, name in sorted(self._threads.items())]
+            return {
+                'traceEvents': metadata + sorted(self.events,
+                                                 key=lambda e: e['ts']),
+                'displayTimeUnit': 'ms',
+            }
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.to_json(), f)
+
+
+class NullTracer(object):
+    """A tracer that records nothing."""
+
+    def add_span(self, name, category, start, end, args=None):
+        pass
+
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        yield
@@ -2,6 +2,9 @@
 
 from contextlib import contextmanager
 import errno
+import fnmatch
+import hashlib
+import importlib
 import logging
 import os
 import shutil
@@ -10,6 +13,23 @@ import tempfile
 import textwrap
 
 
+class LazyModule(object):
+    """A stand-in for a module that is only imported on first use.
+
+    Heavy dependencies (e.g. networkx) are bound with this at module level so
+    that importing importlab stays cheap for callers that never need them.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
 def setup_logging(name, log_file, level=logging.INFO):
     formatter = logging.Formatter(
         fmt='%(asctime)s %(levelname)s %(message)s',
@@ -33,34 +53,132 @@ def cd(path):
 
 
 def expand_path(path, cwd=None):
-    def expand(p):
-        return os.path.realpath(os.path.expanduser(p))
-
+    path = os.path.expanduser(path)
     if cwd:
-        with cd(cwd):
-            return expand(path)
-    else:
-        return expand(path)
+        # os.path.join discards cwd if path is already absolute.
+        path = os.path.join(os.path.expanduser(cwd), path)
+    return os.path.realpath(path)
 
 
 def expand_paths(paths, cwd=None):
     return [expand_path(x, cwd) for x in paths]
 
 
-def collect_files(path, extension):
+def _is_excluded(name, relpath, excludes):
+    return any(fnmatch.fnmatch(name, pat) or fnmatch.fnmatch(relpath, pat)
+               for pat in excludes)
+
+
+def _scan_dir(root, path, extension, excludes):
+    """Scan a single directory.
+
+    Returns:
+      A tuple of (files with extension, subdirectories to descend into).
+      Subdirectories matching an exclude pattern are pruned.
+    """
+    files = []
+    dirs = []
+    try:
+        it = os.scandir(path)
+    except OSError:
+        return files, dirs
+    with it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+                if is_dir and entry.is_symlink():
+                    # Like os.walk, do not descend into symlinked directories,
+                    # which may loop back into the tree.
+                    continue
+            except OSError:
+                continue
+            if excludes:
+                relpath = os.path.relpath(entry.path, root)
+                if _is_excluded(entry.name, relpath, excludes):
+                    continue
+            if is_dir:
+                dirs.append(entry.path)
+            elif entry.name.endswith(extension):
+                files.append(entry.path)
+    return files, dirs
+
+
+def walk_files(path, extension, excludes=(), jobs=1):
+    """Yield all the files with extension in a directory tree.
+
+    Files are yielded as they are discovered, in no particular order.
+
+    Args:
+        path: The root directory.
+        extension: The file extension to collect, e.g. ".py".
+        excludes: Glob patterns matched against the name and the path relative
+          to `path` of every entry. Matching directories are pruned along with
+          their whole subtree.
+        jobs: The number of threads to scan directories with.
+    """
+    if jobs <= 1:
+        stack = [path]
+        while stack:
+            files, dirs = _scan_dir(path, stack.pop(), extension, excludes)
+            yield from files
+            stack.extend(reversed(dirs))
+        return
+    import concurrent.futures
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = {executor.submit(_scan_dir, path, path, extension, excludes)}
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                files, dirs = future.result()
+                for d in dirs:
+                    pending.add(executor.submit(
+                        _scan_dir, path, d, extension, excludes))
+                yield from files
+
+
+def collect_files(path, extension, excludes=()):
     """Collect all the files with extension in a directory tree."""
 
     # We should only call this on an actual directory; callers should do the
     # validation.
     assert os.path.isdir(path)
-    out = []
-    # glob would be faster (see PEP471) but python glob doesn't do **/*
-    for root, _, files in os.walk(path):
-        out += [os.path.join(root, f) for f in files if f.endswith(extension)]
-    return out
+    return list(walk_files(path, extension, excludes))
+
 
+def iter_source_files(filenames, cwd=None, excludes=(), jobs=1):
+    """Lazily expand a list of filenames passed in as sources.
 
-def expand_source_files(filenames, cwd=None):
+    Like expand_source_files, but yields each .py file (without duplicates) as
+    soon as it is discovered, so that callers such as ImportGraph.create can
+    start processing files while discovery is still running.
+
+    Args:
+        filenames: A list of filenames to process.
+        cwd: An optional working directory to expand relative paths
+        excludes: Glob patterns for files and directories to skip while
+          scanning directories (e.g. ".git", "node_modules", "third_party").
+        jobs: The number of threads to scan directories with.
+    Yields:
+        Full paths to .py files
+    """
+    seen = set()
+    for f in filenames:
+        f = expand_path(f, cwd)
+        if os.path.isdir(f):
+            # If we have a directory, collect all the .py files within it.
+            files = walk_files(f, ".py", excludes, jobs)
+        elif f.endswith(".py"):
+            files = [f]
+        else:
+            continue
+        for x in files:
+            if x not in seen:
+                seen.add(x)
+                yield x
+
+
+def expand_source_files(filenames, cwd=None, excludes=(), jobs=1):
     """Expand a list of filenames passed in as sources.
 
     This is a helper function for handling command line arguments that specify a
@@ -72,18 +190,27 @@ def expand_source_files(filenames, cwd=None):
     Args:
         filenames: A list of filenames to process.
         cwd: An optional working directory to expand relative paths
+        excludes: Glob patterns for files and directories to skip while
+          scanning directories.
+        jobs: The number of threads to scan directories with.
     Returns:
         A list of sorted full paths to .py files
     """
-    out = []
-    for f in expand_paths(filenames, cwd):
-        if os.path.isdir(f):
-            # If we have a directory, collect all the .py files within it.
-            out += collect_files(f, ".py")
-        else:
-            if f.endswith(".py"):
-                out.append(f)
-    return sorted(set(out))
+    return sorted(iter_source_files(filenames, cwd, excludes, jobs))
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Return a digest of the contents of a file."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.digest()
+
+
+def hash_bytes(data):
+    """Return a digest of some bytes, comparable with hash_file's."""
+    return hashlib.blake2b(data, digest_size=16).digest()
 
 
 def split_version(version):
@@ -159,9 +286,10 @@ def strip_suffix(string, suffix):
     return string
 
 
-def run_py_file(version, path, *args):
+def run_py_file(version, path, *args, stdin=None):
     exe = 'python%d.%d' % version
     args = [exe, path] + list(args)
-    p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout, stderr = p.communicate()
+    p = subprocess.Popen(args, stdin=None if stdin is None else subprocess.PIPE,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = p.communicate(stdin)
     return p.returncode, stdout, stderr
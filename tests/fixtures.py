@@ -0,0 +1,65 @@
+"""Graphs and source trees shared by several test modules."""
+
+import sys
+import unittest
+
+from importlab import environment
+from importlab import fs
+from importlab import graph
+from importlab import resolve
+from importlab import utils
+
+
+class StaticGraph(graph.DependencyGraph):
+    """A DependencyGraph with fixed dependencies."""
+
+    def __init__(self, deps):
+        super(StaticGraph, self).__init__()
+        self.deps = deps
+
+    def get_file_deps(self, filename):
+        deps = self.deps.get(filename, [])
+        for f in deps:
+            self.provenance[f] = self.get_source_file_provenance(f)
+        return (deps, [])
+
+    def get_source_file_provenance(self, filename):
+        return resolve.Direct(filename, self.module_name(filename))
+
+    def module_name(self, filename):
+        return filename
+
+
+# A package with an import cycle, files importing it and a library dependency,
+# an unresolved import and an unparseable file.
+FILES = {
+        "foo/__init__.py": "",
+        "foo/a.py": "from . import b\nimport missing",
+        "foo/b.py": "from . import a",
+        "bar.py": "import foo.a\nimport lib.dep",
+        "baz.py": "import bar\nimport foo.b",
+        "qux.py": "import baz",
+        "bad.py": "foo(]",
+        "lib/dep.py": "import lib.leaf",
+        "lib/leaf.py": "",
+}
+
+
+class SourceTreeTest(unittest.TestCase):
+    """Base class for tests that crawl the files of FILES in a tempdir."""
+
+    FILES = FILES
+
+    def setUp(self):
+        self.tempdir = utils.Tempdir()
+        self.tempdir.setup()
+        for f in self.FILES:
+            self.tempdir.create_file(f, self.FILES[f])
+        self.env = environment.Environment(
+            fs.Path([self.filesystem()]), sys.version_info[:2])
+
+    def tearDown(self):
+        self.tempdir.teardown()
+
+    def filesystem(self):
+        return fs.OSFileSystem(self.tempdir.path)
@@ -7,3 +7,15 @@ python -m tests.test_output
 python -m tests.test_parsepy
 python -m tests.test_resolve
 python -m tests.test_utils
+python -m tests.test_startup
+python -m tests.test_shard
+python -m tests.test_database
+python -m tests.test_reachability
+python -m tests.test_async_crawl
+python -m tests.test_multiversion
+python -m tests.test_scheduler
+python -m tests.test_critical_path
+python -m tests.test_importtime
+python -m tests.test_packages
+python -m tests.test_manifest
+python -m tests.test_trace
@@ -0,0 +1,100 @@
+"""Tests for async_crawl.py."""
+
+import asyncio
+import time
+import unittest
+
+from importlab import async_crawl
+from importlab import fs
+from importlab import graph
+from importlab import resolve
+
+from tests import fixtures
+
+
+class SlowGraph(fixtures.StaticGraph):
+    """A StaticGraph whose dependencies are slow to read."""
+
+    def __init__(self, deps, delays):
+        super(SlowGraph, self).__init__(deps)
+        self.delays = delays
+
+    def get_file_deps(self, filename):
+        time.sleep(self.delays.get(filename, 0))
+        return super(SlowGraph, self).get_file_deps(filename)
+
+
+class TestAsyncCrawl(fixtures.SourceTreeTest):
+    """Tests for the concurrent crawl."""
+
+    def setUp(self):
+        super(TestAsyncCrawl, self).setUp()
+        self.sources = [self.tempdir[f] for f in ("baz.py", "bad.py")]
+
+    def filesystem(self):
+        return fs.LatencyFileSystem(
+            super(TestAsyncCrawl, self).filesystem(), 0.001)
+
+    def assertSameGraph(self, g1, g2):
+        self.assertEqual(g1.sorted_source_files(), g2.sorted_source_files())
+
+        def edges(g):
+            return sorted((g.format(k), g.format(v)) for k, v in g.graph.edges)
+        self.assertEqual(edges(g1), edges(g2))
+        self.assertEqual(g1.broken_deps, g2.broken_deps)
+        self.assertEqual(g1.unreadable_files, g2.unreadable_files)
+
+    def test_matches_serial_crawl(self):
+        g1 = graph.ImportGraph.create(self.env, self.sources)
+        g2 = async_crawl.create(self.env, self.sources, max_workers=4)
+        self.assertSameGraph(g1, g2)
+        self.assertEqual(g2.unreadable_files, {self.tempdir["bad.py"]})
+
+    def test_budget(self):
+        def budget():
+            return graph.CrawlBudget(max_depth=2)
+        g1 = graph.ImportGraph.create(
+            self.env, self.sources, budget=budget())
+        g2 = async_crawl.create(self.env, self.sources, budget=budget())
+        self.assertSameGraph(g1, g2)
+        self.assertEqual(g2.truncated, {self.tempdir["foo/a.py"],
+                                        self.tempdir["lib/dep.py"]})
+
+    def test_budget_shorter_path_found_later(self):
+        # y.py is reached from a.py first, but is closer to the slow b.py.
+        deps = {"a.py": ["x.py"], "x.py": ["y.py"], "b.py": ["y.py"],
+                "y.py": ["z.py"]}
+
+        def crawl(async_):
+            g = SlowGraph(deps, {"b.py": 0.2})
+            g.budget = graph.CrawlBudget(max_depth=2)
+            if async_:
+                asyncio.run(async_crawl.crawl(g, ["a.py", "b.py"]))
+            else:
+                for f in ["a.py", "b.py"]:
+                    g.add_file_recursive(f)
+            return sorted(g.graph.edges), g.truncated
+        self.assertEqual(crawl(True), crawl(False))
+        self.assertEqual(crawl(True)[1], {"z.py"})
+
+    def test_imported_source_provenance(self):
+        sources = [self.tempdir[f] for f in ("baz.py", "bar.py")]
+        g1 = graph.ImportGraph.create(self.env, sources)
+        g2 = async_crawl.create(self.env, sources, max_workers=4)
+        for g in (g1, g2):
+            self.assertTrue(isinstance(g.provenance[sources[1]],
+                                       resolve.Direct))
+
+    def test_parse_stats_with_many_workers(self):
+        # Identical files parsed concurrently are counted exactly once each.
+        files = [self.tempdir.create_file("gen/m%d.py" % i, "import foo.a")
+                 for i in range(200)]
+        g = async_crawl.create(self.env, files, max_workers=32)
+        stats = g.parse_stats
+        self.assertEqual(stats["parsed"] + stats["reused"], 202)
+        # foo/a.py and foo/b.py form a cycle.
+        self.assertEqual(len(g.graph.nodes), 201)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""Tests for critical_path.py."""
+
+import unittest
+
+from importlab import critical_path
+from importlab import graph
+from importlab import utils
+
+from tests import fixtures
+
+
+# a -> b -> c <-> d -> e; a -> f
+DEPS = {
+        "a": ["b", "f"],
+        "b": ["c"],
+        "c": ["d"],
+        "d": ["c", "e"],
+}
+
+WEIGHTS = {"a": 1, "b": 2, "c": 3, "d": 4, "e": 5, "f": 10}
+
+
+class TestCriticalPath(unittest.TestCase):
+    """Tests for CriticalPath."""
+
+    def setUp(self):
+        self.graph = fixtures.StaticGraph(DEPS)
+        self.graph.add_file_recursive("a")
+        self.graph.build()
+        self.cycle = next(n for n in self.graph.graph.nodes
+                          if isinstance(n, graph.NodeSet))
+
+    def test_path(self):
+        path = critical_path.CriticalPath(self.graph, WEIGHTS)
+        self.assertEqual(path.makespan, 15)
+        self.assertEqual(path.path, ["e", self.cycle, "b", "a"])
+        self.assertEqual(path.weight[self.cycle], 7)
+        self.assertEqual(path.finish[self.cycle], 12)
+        self.assertEqual(path.slack, {
+            "a": 0, "b": 0, self.cycle: 0, "e": 0, "f": 4})
+
+    def test_top_cycles(self):
+        path = critical_path.CriticalPath(self.graph, WEIGHTS)
+        self.assertEqual(path.top_cycles(), [self.cycle])
+
+    def test_missing_weights(self):
+        path = critical_path.CriticalPath(self.graph, {"f": 1})
+        self.assertEqual(path.makespan, 1)
+        self.assertEqual(path.path, ["f", "a"])
+
+    def test_file_size_weights(self):
+        with utils.Tempdir() as d:
+            g = fixtures.StaticGraph({d["a.py"]: [d["b.py"]]})
+            d.create_file("a.py", "x" * 10)
+            d.create_file("b.py", "x" * 20)
+            g.add_file_recursive(d["a.py"])
+            g.build()
+            weights = critical_path.file_size_weights(g)
+        self.assertEqual(weights, {d["a.py"]: 10, d["b.py"]: 20})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+"""Tests for database.py."""
+
+import os
+import unittest
+from unittest import mock
+
+from importlab import database
+from importlab import environment
+from importlab import fs
+
+from tests import fixtures
+
+
+FILES = {
+        "foo/__init__.py": "",
+        "foo/a.py": "from . import b\nimport missing",
+        "foo/b.py": "X = 1",
+        "x.py": "import foo.a\nfrom foo import b",
+}
+
+
+class TestDatabase(fixtures.SourceTreeTest):
+    """Tests for the SQLite import database."""
+
+    FILES = FILES
+
+    def setUp(self):
+        super(TestDatabase, self).setUp()
+        self.db = self.tempdir["imports.db"]
+        database.create(self.db, self.env, [self.tempdir["x.py"]])
+        self.conn = database.connect(self.db)
+
+    def tearDown(self):
+        self.conn.close()
+        super(TestDatabase, self).tearDown()
+
+    def touch(self, filename, contents):
+        path = self.tempdir[filename]
+        with open(path, "w") as f:
+            f.write(contents)
+        # Make sure the change is visible even on coarse mtime filesystems.
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    def test_deps(self):
+        self.assertEqual(database.get_deps(self.conn, self.tempdir["x.py"]),
+                         [self.tempdir["foo/a.py"], self.tempdir["foo/b.py"]])
+        self.assertEqual(
+            database.get_importers(self.conn, self.tempdir["foo/b.py"]),
+            [self.tempdir["foo/a.py"], self.tempdir["x.py"]])
+
+    def test_rows(self):
+        rows = self.conn.execute(
+            "SELECT kind, is_source, parsed FROM files WHERE path = ?",
+            (self.tempdir["x.py"],)).fetchall()
+        self.assertEqual(rows, [("Direct", 1, 1)])
+        unresolved = self.conn.execute(
+            "SELECT name FROM imports WHERE resolved_id IS NULL").fetchall()
+        self.assertEqual(unresolved, [("missing",)])
+
+    def test_refresh_unchanged(self):
+        stats = database.refresh(self.db, self.env)
+        self.assertEqual(sum(stats.values()), 0)
+
+    def test_refresh_changed(self):
+        self.tempdir.create_file("foo/c.py", "")
+        self.touch("foo/b.py", "from . import c")
+        stats = database.refresh(self.db, self.env)
+        self.assertEqual(stats["changed"], 1)
+        self.assertEqual(stats["added"], 1)
+        self.assertEqual(
+            database.get_deps(self.conn, self.tempdir["foo/b.py"]),
+            [self.tempdir["foo/c.py"]])
+        # Unchanged files keep their imports.
+        self.assertEqual(len(database.get_deps(self.conn,
+                                               self.tempdir["x.py"])), 2)
+
+    def test_refresh_deleted(self):
+        self.tempdir.delete_file("foo/b.py")
+        stats = database.refresh(self.db, self.env)
+        self.assertEqual(stats["deleted"], 1)
+        self.assertEqual(stats["reresolved"], 2)
+        # `from foo import b` now resolves to the package.
+        self.assertEqual(database.get_deps(self.conn, self.tempdir["x.py"]),
+                         [self.tempdir["foo/__init__.py"],
+                          self.tempdir["foo/a.py"]])
+        count = self.conn.execute(
+            "SELECT count(*) FROM files WHERE path = ?",
+            (self.tempdir["foo/b.py"],)).fetchone()
+        self.assertEqual(count, (0,))
+
+    def test_refresh_removes_unreachable(self):
+        self.touch("x.py", "from foo import b")
+        stats = database.refresh(self.db, self.env)
+        self.assertEqual(stats["changed"], 1)
+        self.assertEqual(stats["removed"], 1)
+        paths = self.conn.execute("SELECT path FROM files ORDER BY path")
+        self.assertEqual([p for (p,) in paths],
+                         [self.tempdir["foo/b.py"], self.tempdir["x.py"]])
+        unresolved = self.conn.execute(
+            "SELECT count(*) FROM imports WHERE resolved_id IS NULL")
+        self.assertEqual(unresolved.fetchone(), (0,))
+
+    def test_refresh_removes_unreachable_cycle(self):
+        self.touch("foo/b.py", "from . import a")
+        database.refresh(self.db, self.env)
+        self.touch("x.py", "import missing")
+        stats = database.refresh(self.db, self.env)
+        self.assertEqual(stats["removed"], 2)
+        paths = self.conn.execute("SELECT path FROM files WHERE parsed")
+        self.assertEqual([p for (p,) in paths], [self.tempdir["x.py"]])
+
+    def files(self):
+        return self.conn.execute(
+            "SELECT path, kind, module_name, fs_index, is_source, parsed "
+            "FROM files ORDER BY path").fetchall()
+
+    def test_refresh_keeps_imported_sources(self):
+        sources = [self.tempdir["x.py"], self.tempdir["foo/b.py"]]
+        database.create(self.db, self.env, sources)
+        self.touch("x.py", "import foo.a\nfrom foo import b\n")
+        database.refresh(self.db, self.env)
+        refreshed = self.files()
+        database.create(self.db, self.env, sources)
+        self.assertEqual(refreshed, self.files())
+        kind = self.conn.execute(
+            "SELECT kind FROM files WHERE path = ?", (sources[1],))
+        self.assertEqual(kind.fetchone(), ("Direct",))
+
+    def test_refresh_uses_stored_options(self):
+        database.create(self.db, self.env, [self.tempdir["x.py"]],
+                        collapse_system=True)
+        self.touch("x.py", "import foo.a\n")
+        cls = database._RecordingImportGraph
+        with mock.patch.object(cls, "__init__", autospec=True,
+                               side_effect=cls.__init__) as init:
+            database.refresh(self.db, self.env, collapse_system=False)
+        self.assertTrue(init.call_args[1]["collapse_system"])
+
+    def test_create_is_atomic(self):
+        with mock.patch.object(database, "_write_graph",
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                database.create(self.db, self.env, [self.tempdir["foo/b.py"]])
+        # The previous contents are untouched.
+        self.assertEqual(database.get_deps(self.conn, self.tempdir["x.py"]),
+                         [self.tempdir["foo/a.py"], self.tempdir["foo/b.py"]])
+
+    def test_refresh_wrong_version(self):
+        env = environment.Environment(fs.Path(self.env.path), (2, 7))
+        with self.assertRaises(database.DatabaseError):
+            database.refresh(self.db, env)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,10 @@
 """Tests for fs.py."""
 
+import os
+import tarfile
+import tempfile
 import unittest
+from unittest import mock
 
 from importlab import fs
 from importlab import utils
@@ -38,6 +42,49 @@ class TestStoredFileSystem(unittest.TestCase):
         self.assertFalse(f.isdir(""))
 
 
+class TestManifestFileSystem(unittest.TestCase):
+    """Tests for ManifestFileSystem."""
+
+    def setUp(self):
+        self.fs = fs.ManifestFileSystem("/root", list(FILES) + ["x/y/z.py"])
+
+    def testIsFile(self):
+        self.assertTrue(self.fs.isfile("a.py"))
+        self.assertTrue(self.fs.isfile("foo/c.py"))
+        self.assertTrue(self.fs.isfile("./foo/c.py"))
+        self.assertFalse(self.fs.isfile("foo/b.py"))
+        self.assertFalse(self.fs.isfile("foo"))
+        self.assertFalse(self.fs.isfile("a.py/b.py"))
+        self.assertTrue(self.fs.isfile("/root/foo/c.py"))
+        self.assertFalse(self.fs.isfile("/rootfoo/c.py"))
+
+    def testIsDir(self):
+        self.assertTrue(self.fs.isdir(""))
+        self.assertTrue(self.fs.isdir("foo"))
+        # Ancestors of a file are directories too.
+        self.assertTrue(self.fs.isdir("x"))
+        self.assertTrue(self.fs.isdir("x/y"))
+        self.assertFalse(self.fs.isdir("x/y/z.py"))
+        self.assertFalse(self.fs.isdir("y"))
+
+    def testPaths(self):
+        self.assertEqual(self.fs.refer_to("foo/c.py"), "/root/foo/c.py")
+        self.assertEqual(self.fs.relative_path("/root/foo/c"), "foo/c")
+        self.assertIsNone(self.fs.relative_path("/other/foo/c"))
+
+    def testRead(self):
+        f = fs.ManifestFileSystem("/nonexistent", {"a.py": "x", "b.py": None})
+        self.assertEqual(f.read("a.py"), "x")
+        with self.assertRaises(IOError):
+            f.read("b.py")
+
+    def testConflict(self):
+        with self.assertRaises(fs.FileSystemError):
+            fs.ManifestFileSystem("/root", ["a/b.py", "a/b.py/c.py"])
+        with self.assertRaises(fs.FileSystemError):
+            fs.ManifestFileSystem("/root", ["a/b.py/c.py", "a/b.py"])
+
+
 class TestOSFileSystem(unittest.TestCase):
     """Tests for OSFileSystem."""
 
@@ -63,6 +110,54 @@ class TestOSFileSystem(unittest.TestCase):
         self.assertFalse(self.fs.isdir("a.py"))
 
 
+class TestCaseSensitivity(unittest.TestCase):
+    """Tests for case sensitivity detection."""
+
+    def setUp(self):
+        self.tempdir = utils.Tempdir()
+        self.tempdir.setup()
+        self.tempdir.create_file("Foo/a.py")
+
+    def tearDown(self):
+        self.tempdir.teardown()
+
+    def testNoTempFiles(self):
+        with mock.patch.object(tempfile, "mkstemp") as mkstemp:
+            fs.OSFileSystem(self.tempdir.path)
+            self.assertFalse(mkstemp.called)
+
+    def testMatchesSwappedLookup(self):
+        fs._case_insensitive_devices.clear()
+        expected = os.path.exists(self.tempdir["fOO"])
+        self.assertEqual(fs.is_case_insensitive(self.tempdir.path), expected)
+        self.assertEqual(
+            fs.OSFileSystem(self.tempdir.path).is_case_insensitive, expected)
+
+    def testCachedPerDevice(self):
+        fs._case_insensitive_devices.clear()
+        fs.is_case_insensitive(self.tempdir.path)
+        with mock.patch.object(fs, "_probe_case_insensitive") as probe:
+            fs.is_case_insensitive(self.tempdir["Foo"])
+            fs.OSFileSystem(self.tempdir["Foo"])
+            self.assertFalse(probe.called)
+
+    def testMissingPath(self):
+        self.assertFalse(fs.is_case_insensitive(self.tempdir["no/such/dir"]))
+
+    def testUnreadableParent(self):
+        real_stat = os.stat
+
+        def stat(path, *args, **kwargs):
+            if path == os.path.dirname(self.tempdir.path):
+                raise PermissionError(path)
+            return real_stat(path, *args, **kwargs)
+
+        dev = os.stat(self.tempdir.path).st_dev
+        with mock.patch.object(os, "stat", side_effect=stat):
+            result = fs._probe_case_insensitive(self.tempdir.path, dev)
+        self.assertEqual(result, os.path.exists(self.tempdir["fOO"]))
+
+
 class LowercasingFileSystem(fs.RemappingFileSystem):
     """Remapping file system subclass for tests."""
 
@@ -126,5 +221,101 @@ class TestPYIFileSystem(unittest.TestCase):
                          self.tempdir["foo/c.pyi"])
 
 
+class TestListingFileSystem(unittest.TestCase):
+    """Tests for ListingFileSystem."""
+
+    def setUp(self):
+        self.tempdir = utils.Tempdir()
+        self.tempdir.setup()
+        for f in FILES:
+            self.tempdir.create_file(f, FILES[f])
+        for f in ["b.pyi", "foo/__init__.pyi", "bar/__init__.py", "baz.pyi"]:
+            self.tempdir.create_file(f, "")
+        self.fs = fs.ListingFileSystem(self.tempdir.path, (".pyi", ".py"))
+
+    def tearDown(self):
+        self.tempdir.teardown()
+
+    def testIsFile(self):
+        self.assertTrue(self.fs.isfile("a.py"))
+        self.assertTrue(self.fs.isfile("foo/c.py"))
+        self.assertTrue(self.fs.isfile(self.tempdir["foo/c.py"]))
+        self.assertFalse(self.fs.isfile("foo/b.py"))
+        self.assertFalse(self.fs.isfile("foo"))
+        self.assertFalse(self.fs.isfile("A.py"))
+
+    def testIsDir(self):
+        self.assertTrue(self.fs.isdir("foo"))
+        self.assertTrue(self.fs.isdir(""))
+        self.assertFalse(self.fs.isdir("foo/c.py"))
+        self.assertFalse(self.fs.isdir("nonexistent/foo"))
+
+    def testFindModule(self):
+        self.assertEqual(self.fs.find_module("a"), "a.py")
+        self.assertEqual(self.fs.find_module("b"), "b.pyi")
+        self.assertEqual(self.fs.find_module("foo"), "foo/__init__.pyi")
+        self.assertEqual(self.fs.find_module("bar"), "bar/__init__.py")
+        self.assertEqual(self.fs.find_module("baz"), "baz.pyi")
+        self.assertEqual(self.fs.find_module("foo/c"), "foo/c.py")
+        self.assertIsNone(self.fs.find_module("foo/x"))
+        self.assertIsNone(self.fs.find_module("x/y"))
+        py = fs.ListingFileSystem(self.tempdir.path)
+        self.assertEqual(py.find_module("b"), "b.py")
+        self.assertIsNone(py.find_module("baz"))
+        self.assertIsNone(py.find_module("foo"))
+
+    def testListsOnce(self):
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            for _ in range(2):
+                self.fs.find_module("foo/c")
+                self.fs.find_module("foo/d")
+                self.fs.isfile("foo/c.py")
+        # Only foo/ is listed.
+        self.assertEqual(scandir.call_count, 1)
+
+    def testSameAsPYIAndOS(self):
+        # The precedence matches a pyi path followed by an os path.
+        path = [fs.PYIFileSystem(fs.OSFileSystem(self.tempdir.path)),
+                fs.OSFileSystem(self.tempdir.path)]
+        for name in ["a", "b", "foo", "bar", "baz", "foo/c", "x"]:
+            found = [f.refer_to(f.find_module(name)) for f in path
+                     if f.find_module(name)]
+            x = self.fs.find_module(name)
+            self.assertEqual(self.fs.refer_to(x) if x else None,
+                             (found or [None])[0])
+
+
+class TestCachingFileSystem(unittest.TestCase):
+    """Tests for CachingFileSystem."""
+
+    def setUp(self):
+        self.underlying = fs.StoredFileSystem({"foo/a.py": "x"})
+        self.fs = fs.CachingFileSystem(self.underlying)
+
+    def testCachesLookups(self):
+        with mock.patch.object(self.underlying, "isfile",
+                               wraps=self.underlying.isfile) as isfile:
+            self.assertTrue(self.fs.isfile("foo/a.py"))
+            self.assertTrue(self.fs.isfile("foo/a.py"))
+            self.assertFalse(self.fs.isfile("foo/b.py"))
+            self.assertFalse(self.fs.isfile("foo/b.py"))
+        self.assertEqual(isfile.call_count, 2)
+        self.assertTrue(self.fs.isdir("foo"))
+        self.assertEqual(self.fs.read("foo/a.py"), "x")
+
+    def testWithoutFindModule(self):
+        with utils.Tempdir() as d:
+            d.create_file("top/foo/__init__.py")
+            archive = d["src.tar"]
+            with tarfile.open(archive, "w") as tar:
+                tar.add(d["top"], arcname="top")
+            with tarfile.open(archive) as tar:
+                caching_fs = fs.CachingFileSystem(fs.TarFileSystem(tar))
+                self.assertEqual(caching_fs.find_module("foo"),
+                                 "foo/__init__.py")
+                self.assertIsNone(caching_fs.find_module("bar"))
+                self.assertIsNone(caching_fs.relative_path("foo/__init__.py"))
+
+
 if __name__ == "__main__":
     unittest.main()
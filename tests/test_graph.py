@@ -4,6 +4,7 @@ import contextlib
 import os
 import sys
 import unittest
+from unittest import mock
 
 from importlab import environment
 from importlab import fs
@@ -72,6 +73,17 @@ SELF_DEPS = {
     "b.py": (["a.py", "b.py", "d.py"], [], {}),
 }
 
+CHAIN_DEPS = {
+        "a.py": (["b.py"], [], {}),
+        "b.py": (["c.py"], [], {}),
+        "c.py": (["d.py"], [], {}),
+        "x.py": (["b.py"], [], {}),
+}
+
+EXTENSION_DEPS = {
+        "a.py": (["b.so", "c.pyc", "d.py"], [], {}),
+}
+
 SIMPLE_SYSTEM_DEPS = {
         "a.py": (["b.py"], [], {"b.py": resolve.System("b.py", "b")}),
         "b.py": (["c.py"], [], {"c.py": resolve.System("c.py", "c")}),
@@ -152,6 +164,68 @@ class TestDependencyGraph(unittest.TestCase):
             ("a.py", ["b.py"]),
             ("b.py", [])])
 
+    def test_budget_max_depth(self):
+        g = FakeImportGraph(CHAIN_DEPS)
+        g.budget = graph.CrawlBudget(max_depth=2)
+        g.add_file_recursive("a.py")
+        g.build()
+        self.assertEqual(g.ordered_deps_list(), [
+            ("a.py", ["b.py"]),
+            ("b.py", ["c.py"]),
+            ("c.py", [])])
+        self.assertEqual(g.truncated, {"c.py"})
+
+    def test_budget_max_depth_source_order(self):
+        # y.py is two imports away from a.py but only one from b.py.
+        deps = {
+            "a.py": (["x.py"], [], {}),
+            "x.py": (["y.py"], [], {}),
+            "b.py": (["y.py"], [], {}),
+            "y.py": (["z.py"], [], {}),
+            "z.py": (["w.py"], [], {}),
+        }
+        for max_depth, truncated in ((2, {"z.py"}), (3, {"w.py"})):
+            results = []
+            for sources in (["a.py", "b.py"], ["b.py", "a.py"]):
+                g = FakeImportGraph(deps)
+                g.budget = graph.CrawlBudget(max_depth=max_depth)
+                for f in sources:
+                    g.add_file_recursive(f)
+                g.build()
+                results.append((g.ordered_deps_list(), g.truncated))
+            self.assertEqual(results[0], results[1])
+            self.assertEqual(results[0][1], truncated)
+
+    def test_budget_max_files(self):
+        g = FakeImportGraph(CHAIN_DEPS)
+        g.budget = graph.CrawlBudget(max_files=1)
+        g.add_file_recursive("a.py")
+        g.add_file_recursive("x.py")
+        g.build()
+        # Only a.py is read; b.py and the later source x.py are frontier nodes.
+        self.assertEqual(g.ordered_deps_list(), [
+            ("a.py", ["b.py"]),
+            ("b.py", []),
+            ("x.py", [])])
+        self.assertEqual(g.truncated, {"b.py", "x.py"})
+
+    def test_budget_max_seconds(self):
+        g = FakeImportGraph(CHAIN_DEPS)
+        g.budget = graph.CrawlBudget(max_seconds=0)
+        g.add_file_recursive("a.py")
+        g.build()
+        self.assertEqual(g.ordered_deps_list(), [("a.py", [])])
+        self.assertEqual(g.truncated, {"a.py"})
+
+    def test_truncated_source_is_read_later(self):
+        g = FakeImportGraph(CHAIN_DEPS)
+        g.budget = graph.CrawlBudget(max_depth=1)
+        g.add_file_recursive("a.py")
+        self.assertEqual(g.truncated, {"b.py"})
+        g.add_file_recursive("b.py")
+        g.build()
+        self.assertEqual(g.truncated, {"c.py"})
+
     def test_unreadable(self):
         # Unreadable py files are kept in the graph to give the caller
         # flexibility on what to do with them.
@@ -177,6 +251,27 @@ class TestDependencyGraph(unittest.TestCase):
         g.build()
         self.assertEqual(g.ordered_deps_list(), [("a.py", [])])
 
+    def test_non_source_files_are_not_read(self):
+        g = FakeImportGraph(EXTENSION_DEPS)
+        read = []
+        get_file_deps = g.get_file_deps
+
+        def mock_get_file_deps(filename):
+            read.append(filename)
+            return get_file_deps(filename)
+
+        g.get_file_deps = mock_get_file_deps
+        g.add_file_recursive("a.py")
+        g.build()
+        self.assertEqual(sorted(read), ["a.py", "d.py"])
+        self.assertEqual(g.ordered_deps_list(), [
+            ("a.py", ["b.so", "c.pyc", "d.py"]),
+            ("b.so", []),
+            ("c.pyc", []),
+            ("d.py", [])])
+        self.assertEqual(g.non_source_files, {"b.so", "c.pyc"})
+        self.assertEqual(g.unreadable_files, set())
+
     def test_readable_nonpy(self):
         g = FakeImportGraph(SIMPLE_NONPY_DEPS)
         g.add_file_recursive("a.pyi")
@@ -223,6 +318,44 @@ class TestImportGraph(unittest.TestCase):
                 g.sorted_source_files(),
                 [[self.tempdir[x]] for x in ["foo/b.py", "foo/a.py", "x.py"]])
 
+    def test_deduplicate_identical_files(self):
+        # bar/ is a byte-identical copy of foo/; its relative import must
+        # still resolve within bar/.
+        bar = [self.tempdir.create_file("bar/" + f, FILES["foo/" + f])
+               for f in ("a.py", "b.py")]
+        g = graph.ImportGraph.create(self.env, [self.tempdir["x.py"], bar[0]])
+        self.assertEqual(g.parse_stats["parsed"], 3)
+        self.assertEqual(g.parse_stats["reused"], 2)
+        # Reused parses cost as much as the parse they reuse.
+        self.assertEqual(len(g.parse_times), 5)
+        self.assertEqual(g.parse_times[bar[0]],
+                         g.parse_times[self.tempdir["foo/a.py"]])
+        self.assertEqual(
+            sorted(g.graph.successors(self.tempdir["bar/a.py"])),
+            [self.tempdir["bar/b.py"]])
+
+    def test_deduplicate_prefiltered_files(self):
+        # Files with the same imports but different data after them.
+        files = [self.tempdir.create_file("gen%d.py" % i,
+                                          "import x\nDATA = %r\n" % i)
+                 for i in range(3)]
+        with mock.patch.object(utils, "hash_file") as hash_file:
+            g = graph.ImportGraph.create(self.env, files, prefilter=True)
+            self.assertFalse(hash_file.called)
+        # gen0.py, x.py, foo/a.py and foo/b.py.
+        self.assertEqual(g.parse_stats["parsed"], 4)
+        self.assertEqual(g.parse_stats["reused"], 2)
+
+    def test_prefiltered_statement_continues(self):
+        # The prefilter region ends in the middle of the import statement, so
+        # the rest of each file decides what is imported.
+        a = self.tempdir.create_file("a.py", "from foo import (a,\n b)\n")
+        c = self.tempdir.create_file("c.py", "from foo import (a,\n b, x)\n")
+        g = graph.ImportGraph.create(self.env, [a, c], prefilter=True)
+        self.assertEqual(g.parse_stats["reused"], 0)
+        self.assertEqual([imp.name for imp in g.broken_deps[c]], ["foo.x"])
+        self.assertFalse(g.broken_deps[a])
+
     @contextlib.contextmanager
     def patch_resolve_import(self, mock_resolve_file):
         """Patch resolve_import to always return a System file."""
@@ -253,6 +386,21 @@ class TestImportGraph(unittest.TestCase):
                 g2.sorted_source_files(),
                 [[self.tempdir[x]] for x in ["foo/a.py", "x.py"]])
 
+    def test_collapse_system(self):
+        sources = [self.tempdir["x.py"]]
+        mock_resolve_file = lambda f: resolve.System(f.path, f.module_name)
+        with self.patch_resolve_import(mock_resolve_file):
+            g = graph.ImportGraph.create(self.env, sources,
+                                         collapse_system=True)
+            self.assertEqual(
+                g.sorted_source_files(),
+                [[self.tempdir[x]] for x in ["foo", "x.py"]])
+            provenance = g.provenance[self.tempdir["foo"]]
+            self.assertTrue(isinstance(provenance, resolve.System))
+            self.assertEqual(provenance.module_name, "foo")
+            # System files are leaf nodes, so only x.py is parsed.
+            self.assertEqual(g.parse_stats["parsed"], 1)
+
     def test_system_extension(self):
         """Tests that system .so files are included in deps."""
         sources = [self.tempdir["x.py"]]
@@ -289,6 +437,8 @@ class TestImportGraph(unittest.TestCase):
             foo_a = os.path.splitext(self.tempdir["foo/a.py"])[0] + ".so"
             self.assertEqual(g.sorted_source_files(),
                              [[foo_a], [self.tempdir["x.py"]]])
+            self.assertEqual(g.non_source_files, {foo_a})
+            self.assertEqual(g.unreadable_files, set())
 
 
 if __name__ == "__main__":
@@ -1,9 +1,13 @@
 """Tests for import_finder.py."""
 
+import os
+import subprocess
 import sys
+import textwrap
 import unittest
 
 from importlab import import_finder
+from importlab import utils
 
 
 class TestImportFinder(unittest.TestCase):
@@ -21,5 +25,175 @@ class TestImportFinder(unittest.TestCase):
             self.assertIsNone(import_finder.resolve_import('', False, False))
 
 
+class TestPrefilter(unittest.TestCase):
+    """Tests for get_imports with prefilter=True."""
+
+    def get_imports(self, src):
+        with utils.Tempdir() as d:
+            path = d.create_file('t.py', textwrap.dedent(src))
+            full = import_finder.get_imports(path)
+            prefiltered = import_finder.get_imports(path, prefilter=True)
+        self.assertEqual(full, prefiltered)
+        return prefiltered
+
+    def test_header(self):
+        imports = self.get_imports("""
+            import a
+            from b import c
+            DATA = [
+              1, 2, 3,
+            ]
+        """)
+        self.assertEqual([i[0] for i in imports], ['a', 'b.c'])
+
+    def test_nested(self):
+        imports = self.get_imports("""
+            def f():
+                import a
+            x = 1
+        """)
+        self.assertEqual([i[0] for i in imports], ['a'])
+
+    def test_parenthesised(self):
+        # The truncated source is not valid python, so we fall back to parsing
+        # the whole file.
+        imports = self.get_imports("""
+            from a import (b,
+                           c)
+        """)
+        self.assertEqual([i[0] for i in imports], ['a.b', 'a.c'])
+
+    def test_no_imports(self):
+        self.assertEqual(self.get_imports("x = 1"), [])
+
+    def test_empty(self):
+        self.assertEqual(self.get_imports(""), [])
+
+    def test_syntax_error_in_header(self):
+        with utils.Tempdir() as d:
+            path = d.create_file('t.py', 'import a\nfoo(]\nimport b\n')
+            with self.assertRaises(SyntaxError):
+                import_finder.get_imports(path, prefilter=True)
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'bytecode needs python 3.7+')
+class TestBytecode(unittest.TestCase):
+    """Tests for get_imports with bytecode=True."""
+
+    def get_imports(self, src, compile_source=True):
+        """Return the imports read from bytecode, or None if it was not used."""
+        import py_compile
+        with utils.Tempdir() as d:
+            path = d.create_file('t.py', textwrap.dedent(src))
+            if compile_source:
+                py_compile.compile(path, doraise=True)
+            # Without bytecode, get_imports falls back to parsing the source.
+            self.assertEqual(import_finder.get_imports(path, bytecode=True),
+                             import_finder.get_imports(path))
+            return import_finder._bytecode_imports(path)
+
+    def test_imports(self):
+        imports = self.get_imports("""
+            import a, b.c
+            import d.e as f
+            from g import h, i as j
+            from . import k
+            from ..l import *
+            def m():
+                from n.o import p
+            class Q:
+                import r
+        """)
+        self.assertEqual(imports, [
+            ('a', None, False, False),
+            ('b.c', None, False, False),
+            ('d.e', 'f', False, False),
+            ('g.h', 'h', True, False),
+            ('g.i', 'j', True, False),
+            ('.k', 'k', True, False),
+            ('..l', None, True, True),
+            ('n.o.p', 'p', True, False),
+            ('r', None, False, False),
+        ])
+
+    def test_redundant_alias(self):
+        # `import a as a` and `import a` compile to the same bytecode.
+        self.assertIsNone(self.get_imports('import a as a\nimport b'))
+        self.assertEqual(self.get_imports('import a\nimport b as c'), [
+            ('a', None, False, False),
+            ('b', 'c', False, False),
+        ])
+
+    def test_no_bytecode(self):
+        self.assertIsNone(self.get_imports('import a', compile_source=False))
+
+    def test_stale_bytecode(self):
+        import py_compile
+        with utils.Tempdir() as d:
+            path = d.create_file('t.py', 'import a\n')
+            py_compile.compile(path, doraise=True)
+            with open(path, 'a') as f:
+                f.write('import b\n')
+            self.assertIsNone(import_finder._bytecode_imports(path))
+            self.assertEqual(
+                [i[0] for i in import_finder.get_imports(path, bytecode=True)],
+                ['a', 'b'])
+
+    def test_optimized_away(self):
+        # The compiler drops dead code, so the source has to be parsed.
+        self.assertIsNone(self.get_imports("""
+            if False:
+                import a
+        """))
+
+    def test_mangled(self):
+        self.assertIsNone(self.get_imports("""
+            class A:
+                def f(self):
+                    import __a as __b
+        """))
+
+    def test_finally(self):
+        # Statements in a finally block are compiled more than once.
+        self.assertIsNone(self.get_imports("""
+            try:
+                pass
+            finally:
+                import a
+        """))
+
+
+class TestBinaryProtocol(unittest.TestCase):
+    """Tests for the binary protocol used to talk to other python versions."""
+
+    def test_round_trip(self):
+        records = [
+            [('os', None, False, False, '/usr/lib/os.py'),
+             ('a.b', 'c', True, False, None)],
+            None,
+            [('os', None, False, False, '/usr/lib/os.py'),
+             ('.x', None, True, True, '/caf\u00e9/x.py')],
+            [],
+        ]
+        writer = import_finder.RecordWriter()
+        data = b''.join(writer.record(r) for r in records)
+        self.assertEqual(list(import_finder.read_records(data)), records)
+        # Each distinct string is only sent once.
+        self.assertEqual(data.count(b'/usr/lib/os.py'), 1)
+
+    def test_subprocess(self):
+        with utils.Tempdir() as d:
+            ok = d.create_file('caf\u00e9.py', 'import os\nfrom . import x\n')
+            bad = d.create_file('bad.py', 'foo(]')
+            request = import_finder.encode_request(
+                [os.fsencode(ok), os.fsencode(bad)])
+            p = subprocess.run(
+                [sys.executable, import_finder.__file__, '--binary'],
+                input=request, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            ok_imports, bad_imports = import_finder.read_records(p.stdout)
+            self.assertEqual(ok_imports, import_finder.get_imports(ok))
+            self.assertIsNone(bad_imports)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,86 @@
+"""Tests for importtime.py."""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+from importlab import environment
+from importlab import fs
+from importlab import graph
+from importlab import importtime
+from importlab import utils
+
+
+LOG = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     app.c
+import time:       200 |        300 |   app.b
+import time:        50 |         50 |   app.d
+import time:        10 |        360 | app.a
+some other output
+"""
+
+FILES = {
+        "app/__init__.py": "",
+        "app/a.py": "import app.b\nimport app.d",
+        "app/b.py": "import app.c",
+        "app/c.py": "",
+        "app/d.py": "",
+}
+
+
+class TestImportTime(unittest.TestCase):
+    """Tests for import time analysis."""
+
+    def setUp(self):
+        self.tempdir = utils.Tempdir()
+        self.tempdir.setup()
+        for f in FILES:
+            self.tempdir.create_file(f, FILES[f])
+        self.env = environment.Environment(
+            fs.Path([fs.OSFileSystem(self.tempdir.path)]),
+            sys.version_info[:2])
+
+    def tearDown(self):
+        self.tempdir.teardown()
+
+    def test_parse_log(self):
+        times = importtime.parse_log(LOG.splitlines())
+        self.assertEqual(times["app.b"], importtime.ImportTime(200, 300))
+        self.assertEqual(sorted(times), ["app.a", "app.b", "app.c", "app.d"])
+
+    def test_heaviest_chains(self):
+        g = graph.ImportGraph.create(self.env, [self.tempdir["app/a.py"]])
+        times = importtime.parse_log(LOG.splitlines())
+        node_times = importtime.attach(g, times)
+        b = self.tempdir["app/b.py"]
+        self.assertEqual(g.graph.nodes[b]["cumulative_us"], 300)
+        chains = importtime.heaviest_chains(g, node_times)
+        self.assertEqual(list(chains), [self.tempdir["app/a.py"]])
+        a = self.tempdir["app/a.py"]
+        self.assertEqual(
+            [[f for f, _ in chain] for chain in chains[a]],
+            [[b, self.tempdir["app/c.py"]], [self.tempdir["app/d.py"]]])
+
+    def test_run_importtime(self):
+        log = importtime.run_importtime(
+            sys.version_info[:2], ["app.d", "no_such_module"],
+            self.tempdir.path)
+        self.assertIn("app.d", importtime.parse_log(log))
+
+    def test_run_importtime_keeps_pythonpath(self):
+        with utils.Tempdir() as other:
+            other.create_file("extra.py")
+            env = {"PYTHONPATH": other.path}
+            with mock.patch.dict(os.environ, env):
+                log = importtime.run_importtime(
+                    sys.version_info[:2], ["app.d", "extra"],
+                    self.tempdir.path)
+        times = importtime.parse_log(log)
+        self.assertIn("app.d", times)
+        self.assertIn("extra", times)
+
+
+if __name__ == "__main__":
+    unittest.main()
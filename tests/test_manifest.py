@@ -0,0 +1,104 @@
+"""Tests for manifest.py."""
+
+import json
+import os
+import sys
+import unittest
+
+from importlab import environment
+from importlab import fs
+from importlab import graph
+from importlab import manifest
+from importlab import parsepy
+from importlab import utils
+
+
+# A tree that only exists in the manifest.
+FILES = {
+        "foo/__init__.py": {"imports": []},
+        "foo/a.py": {
+            "digest": "1",
+            "imports": [["foo.b", None, False, False, None],
+                        ["foo.c.d", None, False, False, None]],
+        },
+        "foo/b.py": {"digest": "2", "imports": [[".a", "a", True, False,
+                                                 None]]},
+        "foo/c/d.py": {"imports": [["missing", None, False, False, None]]},
+        "README": None,
+}
+
+
+class TestManifest(unittest.TestCase):
+    """Tests for Manifest."""
+
+    def setUp(self):
+        self.manifest = manifest.Manifest("/nonexistent", FILES)
+
+    def test_entries(self):
+        self.assertEqual(self.manifest.files, sorted(FILES))
+        self.assertEqual(self.manifest.digests,
+                         {"/nonexistent/foo/a.py": "1",
+                          "/nonexistent/foo/b.py": "2"})
+        self.assertEqual(self.manifest.imports["/nonexistent/foo/b.py"],
+                         [parsepy.ImportStatement(".a", "a", True, False)])
+
+    def test_select(self):
+        self.assertEqual(self.manifest.select(), [
+            "/nonexistent/foo/__init__.py",
+            "/nonexistent/foo/a.py",
+            "/nonexistent/foo/b.py",
+            "/nonexistent/foo/c/d.py",
+        ])
+        self.assertEqual(self.manifest.select(["/nonexistent/foo/c"]),
+                         ["/nonexistent/foo/c/d.py"])
+        self.assertEqual(self.manifest.select(["/nonexistent/foo/a.py"]),
+                         ["/nonexistent/foo/a.py"])
+        self.assertEqual(self.manifest.select(["/nonexistent/fo"]), [])
+
+    def test_bad_imports(self):
+        with self.assertRaises(manifest.ManifestError):
+            manifest.Manifest("/", {"a.py": {"imports": [1]}})
+
+    def test_load(self):
+        with utils.Tempdir() as d:
+            path = d.create_file("manifest.json", json.dumps(
+                {"root": "src", "files": ["a.py", "b/c.py"]}))
+            m = manifest.Manifest.load(path)
+            self.assertEqual(m.root, os.path.join(d.path, "src"))
+            self.assertEqual(m.files, ["a.py", "b/c.py"])
+            d.create_file("bad.json", "{}")
+            with self.assertRaises(manifest.ManifestError):
+                manifest.Manifest.load(os.path.join(d.path, "bad.json"))
+
+    def test_graph(self):
+        # The files do not exist, so this also checks that they are not read.
+        env = environment.Environment(
+            fs.Path([self.manifest.filesystem()]), sys.version_info[:2])
+        g = graph.ImportGraph.create(env, self.manifest.select(),
+                                     manifest=self.manifest)
+        self.assertEqual(set(g.parse_stats), {"known"})
+        self.assertEqual(sorted(g.get_all_unresolved()),
+                         [parsepy.ImportStatement("missing")])
+        cycles = [x for x, _ in g.deps_list() if isinstance(x, graph.NodeSet)]
+        self.assertEqual([c.nodes for c in cycles], [
+            ["/nonexistent/foo/a.py", "/nonexistent/foo/b.py"]])
+        self.assertEqual(g.provenance["/nonexistent/foo/c/d.py"].module_name,
+                         "foo.c.d")
+
+    def test_unknown_imports(self):
+        # Files without imports in the manifest are read from disk.
+        with utils.Tempdir() as d:
+            d.create_file("a.py", "import b")
+            d.create_file("b.py", "")
+            m = manifest.Manifest(d.path, {"a.py": None, "b.py": {
+                "imports": []}})
+            env = environment.Environment(fs.Path([m.filesystem()]),
+                                          sys.version_info[:2])
+            g = graph.ImportGraph.create(env, m.select(), manifest=m)
+        self.assertEqual(g.parse_stats["parsed"], 1)
+        self.assertEqual(sorted(g.graph.edges), [
+            (os.path.join(d.path, "a.py"), os.path.join(d.path, "b.py"))])
+
+
+if __name__ == "__main__":
+    unittest.main()
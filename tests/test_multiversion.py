@@ -0,0 +1,89 @@
+"""Tests for multiversion.py."""
+
+import sys
+import unittest
+from unittest import mock
+
+from importlab import environment
+from importlab import fs
+from importlab import graph
+from importlab import multiversion
+from importlab import parsepy
+from importlab import utils
+
+
+FILES = {
+        "foo/__init__.py": "",
+        "foo/a.py": "from . import b",
+        "foo/b.py": "pass",
+        "x.py": "import foo.a\nimport foo.b",
+}
+
+HOST = sys.version_info[:2]
+OTHER = (2, 7)
+
+
+class TestMultiVersion(unittest.TestCase):
+    """Tests for building graphs for several python versions."""
+
+    def setUp(self):
+        self.tempdir = utils.Tempdir()
+        self.tempdir.setup()
+        for f in FILES:
+            self.tempdir.create_file(f, FILES[f])
+        self.env = environment.Environment(
+            fs.Path([fs.OSFileSystem(self.tempdir.path)]), HOST)
+        get_imports = parsepy.get_imports
+
+        def mock_get_imports(filename, python_version, prefilter=False,
+                             bytecode=False):
+            # Pretend that x.py does not import foo.b in the other version.
+            imports = get_imports(filename, HOST, prefilter)
+            if python_version == OTHER:
+                imports = [imp for imp in imports if imp.name != "foo.b"]
+            return imports
+
+        def mock_get_imports_batch(filenames, python_version, prefilter=False,
+                                   bytecode=False):
+            return [mock_get_imports(f, python_version, prefilter)
+                    for f in filenames]
+
+        for name, value in [("get_imports", mock_get_imports),
+                            ("get_imports_batch", mock_get_imports_batch)]:
+            patcher = mock.patch.object(parsepy, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tempdir.teardown()
+
+    def test_create(self):
+        graphs, diff = multiversion.create(
+            self.env, [self.tempdir["x.py"]], [HOST, OTHER])
+        self.assertEqual(list(graphs), [HOST, OTHER])
+        expected = graph.ImportGraph.create(self.env, [self.tempdir["x.py"]])
+        self.assertEqual(graphs[HOST].sorted_source_files(),
+                         expected.sorted_source_files())
+        self.assertEqual(diff, {
+            (self.tempdir["x.py"], self.tempdir["foo/b.py"]): [HOST]})
+
+    def test_concurrent(self):
+        _, serial = multiversion.create(
+            self.env, [self.tempdir["x.py"]], [HOST, OTHER])
+        _, concurrent = multiversion.create(
+            self.env, [self.tempdir["x.py"]], [HOST, OTHER], jobs=4)
+        self.assertEqual(serial, concurrent)
+
+    def test_budget_per_version(self):
+        budget = graph.CrawlBudget(max_files=1)
+        graphs, _ = multiversion.create(
+            self.env, [self.tempdir["x.py"]], [HOST, OTHER], budget=budget)
+        # Each version reads x.py and truncates its imports.
+        for import_graph in graphs.values():
+            self.assertEqual(import_graph.budget.files, 1)
+            self.assertIn(self.tempdir["foo/a.py"], import_graph.truncated)
+        self.assertEqual(budget.files, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
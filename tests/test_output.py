@@ -72,6 +72,10 @@ class TestOutput(unittest.TestCase):
     def test_formatted_deps_list(self):
         self.assertString(output.formatted_deps_list(self.graph))
 
+    def test_print_deps_list(self):
+        self.assertPrints(output.print_deps_list)
+        self.assertPrints(lambda g: output.print_deps_list(g, reduced=True))
+
     def test_print_unresolved(self):
         self.assertPrints(output.print_unresolved_dependencies)
 
@@ -0,0 +1,110 @@
+"""Tests for packages.py."""
+
+import unittest
+
+from importlab import packages
+from importlab import resolve
+
+from tests import fixtures
+
+
+class ModuleGraph(fixtures.StaticGraph):
+    """A StaticGraph of files named after their modules, e.g. a/b/c.py."""
+
+    def module_name(self, filename):
+        return filename[:-3].replace("/", ".")
+
+
+# a.x imports a.y, b.p.q and b.r.s; b.p.q imports c.z and c.w, which imports
+# b.r.s.
+DEPS = {
+        "a/x.py": ["a/y.py", "b/p/q.py", "b/r/s.py"],
+        "b/p/q.py": ["c/z.py", "c/w.py"],
+        "c/w.py": ["b/r/s.py"],
+}
+
+
+class TestPackageKey(unittest.TestCase):
+    """Tests for package_key."""
+
+    def test_key(self):
+        f = resolve.System("/site/a/b/c.py", "a.b.c")
+        self.assertEqual(packages.package_key(f), "a.b")
+        self.assertEqual(packages.package_key(f, 1), "a")
+        self.assertEqual(packages.package_key(f, 3), "a.b")
+
+    def test_package(self):
+        f = resolve.System("/site/a/b/__init__.py", "a.b")
+        self.assertEqual(packages.package_key(f), "a.b")
+
+    def test_top_level(self):
+        f = resolve.System("/site/a.py", "a")
+        self.assertEqual(packages.package_key(f), "a")
+
+    def test_unknown(self):
+        self.assertIsNone(packages.package_key(None))
+        self.assertIsNone(packages.package_key(resolve.Direct("x.py", "")))
+        self.assertIsNone(
+            packages.package_key(resolve.Local(".x.py", ".x", None)))
+
+
+class TestPackageGraph(unittest.TestCase):
+    """Tests for PackageGraph."""
+
+    def make_graph(self, build):
+        g = ModuleGraph(DEPS)
+        g.add_file_recursive("a/x.py")
+        if build:
+            g.build()
+        return g
+
+    def edges(self, package_graph):
+        fmt = package_graph.format
+        edges = package_graph.graph.edges(data="count")
+        return sorted((fmt(k), fmt(v), count) for k, v, count in edges)
+
+    def test_full_package_names(self):
+        p = packages.PackageGraph(self.make_graph(build=False))
+        self.assertEqual(self.edges(p), [
+            ("a", "b.p", 1),
+            ("a", "b.r", 1),
+            ("b.p", "c", 2),
+            ("c", "b.r", 1),
+        ])
+        self.assertEqual(p.packages["b/p/q.py"], "b.p")
+
+    def test_cycle(self):
+        # At depth 1, b -> c -> b is a cycle.
+        p = packages.PackageGraph(self.make_graph(build=False), depth=1)
+        self.assertEqual(self.edges(p), [("a", "[b->c]", 2)])
+        (cycle,) = p.graph.successors("a")
+        self.assertEqual(p.files[cycle],
+                         ["b/p/q.py", "b/r/s.py", "c/w.py", "c/z.py"])
+        self.assertEqual(p.files["a"], ["a/x.py", "a/y.py"])
+
+    def test_built_graph(self):
+        # b.p.q -> c.w -> b.r.s is not a cycle, so the result is the same.
+        built = packages.PackageGraph(self.make_graph(build=True))
+        unbuilt = packages.PackageGraph(self.make_graph(build=False))
+        self.assertEqual(self.edges(built), self.edges(unbuilt))
+
+    def test_file_cycle(self):
+        # The packages of an import cycle of files end up in one package cycle.
+        g = ModuleGraph({"a/x.py": ["b/y.py"], "b/y.py": ["a/x.py", "c/z.py"]})
+        g.add_file_recursive("a/x.py")
+        g.build()
+        p = packages.PackageGraph(g)
+        self.assertEqual(self.edges(p), [("[a->b]", "c", 1)])
+
+    def test_deps_list(self):
+        p = packages.PackageGraph(self.make_graph(build=True))
+        deps = {p.format(k): sorted((p.format(v), n) for v, n in d)
+                for k, d in p.deps_list()}
+        self.assertEqual(deps["b.p"], [("c", 2)])
+        order = [k for k, _ in p.deps_list()]
+        for k, v in p.graph.edges:
+            self.assertLess(order.index(k), order.index(v))
+
+
+if __name__ == "__main__":
+    unittest.main()
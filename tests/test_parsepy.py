@@ -14,12 +14,17 @@
 
 """Tests for parsepy.py."""
 
+import os
+import struct
 import tempfile
 import textwrap
 import unittest
 import sys
+from unittest import mock
 
+from importlab import import_finder
 from importlab import parsepy
+from importlab import utils
 
 
 class TestParsePy(unittest.TestCase):
@@ -209,5 +214,58 @@ class TestParsePy(unittest.TestCase):
             self.parse("foo(]")
 
 
+class TestGetImportsBatch(unittest.TestCase):
+    """Tests for parsing with a subprocess."""
+
+    def test_subprocess(self):
+        run_py_file = utils.run_py_file
+        host = sys.version_info[:2]
+
+        def run_with_host(version, path, *args, **kwargs):
+            return run_py_file(host, path, *args, **kwargs)
+
+        with utils.Tempdir() as d:
+            files = [d.create_file('a.py', 'import a.b as c\nfrom d import *'),
+                     d.create_file('b.py', 'foo(]'),
+                     d.create_file('c.py', 'import a.b as c')]
+            # Pretend to be a different python version, to force the batch
+            # into a subprocess that runs the host python.
+            with mock.patch.object(utils, 'run_py_file', run_with_host):
+                out = parsepy.get_imports_batch(files, (host[0], host[1] + 1))
+        self.assertEqual(out[0], [
+            parsepy.ImportStatement(name='a.b', new_name='c'),
+            parsepy.ImportStatement(name='d', is_from=True, is_star=True)])
+        self.assertIsInstance(out[1], parsepy.ParseError)
+        self.assertEqual(out[2], out[0][:1])
+
+    def test_subprocess_crash(self):
+        run_py_file = utils.run_py_file
+        host = sys.version_info[:2]
+        requests = []
+
+        def crash_after_first_file(version, path, *args, **kwargs):
+            ret, stdout, stderr = run_py_file(host, path, *args, **kwargs)
+            requests.append(kwargs['stdin'])
+            if len(requests) > 1:
+                return ret, stdout, stderr
+            # Die while writing the second record.
+            (length,) = struct.unpack_from('<I', stdout)
+            return 1, stdout[:length + 10], b'Segmentation fault'
+
+        with utils.Tempdir() as d:
+            files = [d.create_file('a.py', 'import a'),
+                     d.create_file('b.py', 'import b'),
+                     d.create_file('c.py', 'foo(]')]
+            with mock.patch.object(utils, 'run_py_file',
+                                   crash_after_first_file):
+                out = parsepy.get_imports_batch(files, (host[0], host[1] + 1))
+        # Only the files after the first are parsed again, one at a time.
+        self.assertEqual(requests[1:], [
+            import_finder.encode_request([os.fsencode(f)]) for f in files[1:]])
+        self.assertEqual(out[0], [parsepy.ImportStatement(name='a')])
+        self.assertEqual(out[1], [parsepy.ImportStatement(name='b')])
+        self.assertIsInstance(out[2], parsepy.ParseError)
+
+
 if __name__ == '__main__':
     unittest.main()
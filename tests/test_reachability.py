@@ -0,0 +1,114 @@
+"""Tests for reachability.py."""
+
+import unittest
+
+from importlab import reachability
+
+from tests import fixtures
+
+
+# a -> b -> c <-> d -> e, a -> f
+DEPS = {
+        "a": ["b", "f"],
+        "b": ["c"],
+        "c": ["d"],
+        "d": ["c", "e"],
+}
+
+
+class TestReachabilityIndex(unittest.TestCase):
+    """Tests for ReachabilityIndex."""
+
+    def setUp(self):
+        g = fixtures.StaticGraph(DEPS)
+        g.add_file_recursive("a")
+        g.build()
+        self.index = reachability.ReachabilityIndex(g)
+
+    def test_depends_on(self):
+        self.assertTrue(self.index.depends_on("a", "e"))
+        self.assertTrue(self.index.depends_on("b", "d"))
+        self.assertFalse(self.index.depends_on("e", "a"))
+        self.assertFalse(self.index.depends_on("f", "b"))
+        self.assertFalse(self.index.depends_on("a", "a"))
+
+    def test_cycle(self):
+        self.assertTrue(self.index.depends_on("c", "d"))
+        self.assertTrue(self.index.depends_on("d", "c"))
+        self.assertTrue(self.index.depends_on("c", "c"))
+
+    def test_closure(self):
+        self.assertEqual(self.index.closure("a"),
+                         {"b", "c", "d", "e", "f"})
+        self.assertEqual(self.index.closure("c"), {"c", "d", "e"})
+        self.assertEqual(self.index.closure("e"), set())
+
+    def test_unknown_file(self):
+        with self.assertRaises(reachability.ReachabilityError):
+            self.index.depends_on("a", "z")
+
+    def test_memory(self):
+        self.assertGreater(self.index.memory_bytes, 0)
+        g = fixtures.StaticGraph({str(i): [str(i + 1)] for i in range(100)})
+        g.add_file_recursive("0")
+        g.build()
+        with self.assertRaises(reachability.ReachabilityError):
+            reachability.ReachabilityIndex(g, max_bytes=1000)
+
+
+class TestTransitiveReduction(unittest.TestCase):
+    """Tests for transitive_reduction."""
+
+    def reduce(self, deps, root="a"):
+        g = fixtures.StaticGraph(deps)
+        g.add_file_recursive(root)
+        g.build()
+        return g, reachability.transitive_reduction(g)
+
+    def test_redundant(self):
+        # a -> c is implied by a -> b -> c, and a -> d by a -> b -> c -> d.
+        _, redundant = self.reduce({
+            "a": ["b", "c", "d"],
+            "b": ["c"],
+            "c": ["d"],
+        })
+        self.assertEqual(redundant, {("a", "c"), ("a", "d")})
+
+    def test_diamond(self):
+        # Neither path of a diamond is implied by the other.
+        _, redundant = self.reduce({
+            "a": ["b", "c", "d"],
+            "b": ["d"],
+            "c": ["d"],
+        })
+        self.assertEqual(redundant, {("a", "d")})
+
+    def test_cycle(self):
+        g, redundant = self.reduce(DEPS)
+        self.assertEqual(redundant, set())
+        # a -> e is implied by a -> b -> [c, d] -> e.
+        g, redundant = self.reduce(dict(DEPS, a=["b", "e", "f"]))
+        self.assertEqual(redundant, {("a", "e")})
+
+    def test_deps_list(self):
+        g, _ = self.reduce({"a": ["b", "c"], "b": ["c"]})
+        self.assertEqual(dict(g.deps_list()), {"a": ["b", "c"], "b": ["c"],
+                                               "c": []})
+        self.assertEqual(dict(g.deps_list(reduced=True)),
+                         {"a": ["b"], "b": ["c"], "c": []})
+
+    def test_same_reachability(self):
+        deps = {str(i): [str(j) for j in range(i + 1, 12) if j % (i + 1) == 0
+                         or j == i + 1] for i in range(12)}
+        g, redundant = self.reduce(deps, root="0")
+        full = reachability.ReachabilityIndex(g)
+        for edge in redundant:
+            g.graph.remove_edge(*edge)
+        reduced = reachability.ReachabilityIndex(g)
+        for node in g.graph.nodes:
+            self.assertEqual(full.closure(node), reduced.closure(node))
+        self.assertEqual(reachability.transitive_reduction(g), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
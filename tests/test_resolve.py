@@ -1,5 +1,8 @@
 """Tests for resolve.py."""
 
+import copy
+import pickle
+import tarfile
 import unittest
 
 from importlab import fs
@@ -282,6 +285,35 @@ class TestResolver(unittest.TestCase):
             self.assertTrue(isinstance(f, resolve.System))
             self.assertEqual(f.module_name, "foo.y")
 
+    def testResolveImports(self):
+        # from foo import c, d, missing; from foo import c
+        imps = [parsepy.ImportStatement("foo.c", is_from=True),
+                parsepy.ImportStatement("foo.d", is_from=True),
+                parsepy.ImportStatement("missing"),
+                parsepy.ImportStatement("foo.c", is_from=True)]
+        r = self.make_resolver("x.py", "x")
+        results = r.resolve_imports(imps)
+        self.assertEqual([f.path for f in results if f is not results[2]],
+                         ["foo/c.py", "foo/d.py", "foo/c.py"])
+        self.assertTrue(isinstance(results[2], resolve.ImportException))
+        # The duplicate statement is only resolved once.
+        self.assertIs(results[0], results[3])
+
+    def testResolveImportsSharesProbes(self):
+        counts = {}
+        isfile = self.py_fs.isfile
+
+        def counting_isfile(path):
+            counts[path] = counts.get(path, 0) + 1
+            return isfile(path)
+        self.py_fs.isfile = counting_isfile
+        imps = [parsepy.ImportStatement("foo.X", is_from=True),
+                parsepy.ImportStatement("foo.Y", is_from=True)]
+        r = self.make_resolver("x.py", "x")
+        r.resolve_imports(imps)
+        self.assertEqual(counts["foo/__init__.py"], 1)
+        self.assertEqual(counts["foo.py"], 1)
+
     def testResolveRelativeInNonPackage(self):
         r = self.make_resolver("a.py", "a")
         imp = parsepy.ImportStatement(".b", is_from=True)
@@ -309,6 +341,78 @@ class TestResolver(unittest.TestCase):
                         assert expected_resolution == "system"
                         self.assertTrue(isinstance(f, resolve.System))
 
+    def testResolveWithListing(self):
+        with utils.Tempdir() as d:
+            for f in ["a.py", "a.pyi", "foo/__init__.py", "foo/c.py"]:
+                d.create_file(f, "")
+            listing_fs = fs.ListingFileSystem(d.path, (".pyi", ".py"))
+            self.path = [listing_fs]
+            r = self.make_resolver("b.py", "b")
+            f = r.resolve_import(parsepy.ImportStatement("a"))
+            self.assertEqual(f.path, d["a.pyi"])
+            f = r.resolve_import(parsepy.ImportStatement("foo.c"))
+            self.assertEqual(f.path, d["foo/c.py"])
+            self.assertEqual(f.module_name, "foo.c")
+
+    def testResolveWithTarFile(self):
+        with utils.Tempdir() as d:
+            for f in ["top/a.py", "top/foo/__init__.py", "top/foo/c.py"]:
+                d.create_file(f, "")
+            archive = d["src.tar"]
+            with tarfile.open(archive, "w") as tar:
+                tar.add(d["top"], arcname="top")
+            with tarfile.open(archive) as tar:
+                self.path = [fs.TarFileSystem(tar)]
+                r = self.make_resolver("b.py", "b")
+                f = r.resolve_import(parsepy.ImportStatement("a"))
+                self.assertEqual(f.path, "tar:a.py")
+                self.assertEqual(f.module_name, "a")
+                f = r.resolve_import(parsepy.ImportStatement("foo"))
+                self.assertEqual(f.path, "tar:foo/__init__.py")
+                f = r.resolve_import(parsepy.ImportStatement("foo.c"))
+                self.assertEqual(f.path, "tar:foo/c.py")
+
+
+class TestResolvedFile(unittest.TestCase):
+    """Tests for ResolvedFile."""
+
+    def testDerivedFields(self):
+        f = resolve.System("/system/foo/bar/__init__.py", "foo.bar")
+        self.assertEqual(f.package_name, "foo.bar")
+        self.assertEqual(f.short_path, "foo/bar/__init__.py")
+        # Cached values are returned on subsequent accesses.
+        self.assertIs(f.short_path, f.short_path)
+        g = resolve.Local("foo/c.py", "foo.c", "fs1")
+        self.assertEqual(g.package_name, "foo")
+        self.assertIsNone(resolve.Direct("x.py", "x").package_name)
+
+    def testImmutable(self):
+        f = resolve.System("/system/f.py", "f")
+        with self.assertRaises(AttributeError):
+            f.path = "/system/g.py"
+        with self.assertRaises(AttributeError):
+            f.extra = 1
+
+    def testHashable(self):
+        self.assertEqual(resolve.System("a.py", "a"),
+                         resolve.System("a.py", "a"))
+        self.assertNotEqual(resolve.System("a.py", "a"),
+                            resolve.Direct("a.py", "a"))
+        self.assertNotEqual(resolve.Local("a.py", "a", "fs1"),
+                            resolve.Local("a.py", "a", "fs2"))
+        self.assertEqual(len({resolve.System("a.py", "a"),
+                              resolve.System("a.py", "a")}), 1)
+
+    def testPickleAndCopy(self):
+        for f in (resolve.System("/system/f.py", "f"),
+                  resolve.Direct("x.py"),
+                  resolve.Local("foo/c.py", "foo.c", "fs1")):
+            for g in (pickle.loads(pickle.dumps(f)), copy.copy(f),
+                      copy.deepcopy(f)):
+                self.assertEqual(g, f)
+                self.assertIs(g.__class__, f.__class__)
+                self.assertEqual(g.short_path, f.short_path)
+
 
 class TestResolverUtils(unittest.TestCase):
     """Tests for utility functions."""
@@ -341,6 +445,24 @@ class TestResolverUtils(unittest.TestCase):
                     resolve.infer_module_name(py_file, fspath),
                     "foo")
 
+    def testTopLevelPackage(self):
+        test_cases = [
+                ("/site/np/core/multiarray.py", "np.core.multiarray",
+                 "/site/np", "np"),
+                ("/site/np/core/__init__.py", "np.core", "/site/np", "np"),
+                ("/site/np/__init__.py", "np", "/site/np", "np"),
+                ("/site/np/_ext.cpython-311.so", "np._ext", "/site/np", "np"),
+                ("/site/six.py", "six", "/site/six.py", "six"),
+                # Paths that don't match the module name are left alone.
+                ("/site/other/x.py", "np.x", "/site/other/x.py", "np.x"),
+                ("x.py", "a.b.x", "x.py", "a.b.x"),
+        ]
+        for path, module_name, expected_path, expected_name in test_cases:
+            f = resolve.top_level_package(resolve.System(path, module_name))
+            self.assertTrue(isinstance(f, resolve.System))
+            self.assertEqual(f.path, expected_path)
+            self.assertEqual(f.module_name, expected_name)
+
     def testGetAbsoluteName(self):
         test_cases = [
                 ("x.y", "a.b", "x.y.a.b"),
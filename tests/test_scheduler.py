@@ -0,0 +1,107 @@
+"""Tests for scheduler.py."""
+
+import concurrent.futures
+import threading
+import unittest
+
+from importlab import graph
+from importlab import scheduler
+
+from tests import fixtures
+
+
+# a -> b -> c <-> d -> e; a -> f; x -> f
+DEPS = {
+        "a": ["b", "f"],
+        "b": ["c"],
+        "c": ["d"],
+        "d": ["c", "e"],
+        "x": ["f"],
+}
+
+
+class TestScheduler(unittest.TestCase):
+    """Tests for Scheduler."""
+
+    def setUp(self):
+        self.graph = fixtures.StaticGraph(DEPS)
+        self.graph.add_file_recursive("a")
+        self.graph.add_file_recursive("x")
+        self.graph.build()
+        self.cycle = next(n for n in self.graph.graph.nodes
+                          if isinstance(n, graph.NodeSet))
+
+    def test_priority(self):
+        s = scheduler.Scheduler(self.graph)
+        # e and f are both ready, but e has the longer chain of importers.
+        self.assertEqual(s.priority["e"], 4)
+        self.assertEqual(s.priority["f"], 2)
+        self.assertEqual(s.get(), "e")
+        self.assertEqual(s.get(), "f")
+        # Nothing else is ready until e or f is done.
+        self.assertIsNone(s.get(block=False))
+        s.done("f")
+        self.assertEqual(s.get(), "x")
+        s.done("e")
+        self.assertIs(s.get(), self.cycle)
+        s.done(self.cycle)
+        self.assertEqual(s.get(), "b")
+
+    def test_weights(self):
+        s = scheduler.Scheduler(self.graph, {"f": 10})
+        self.assertEqual(s.priority["f"], 10)
+        self.assertEqual(s.priority["e"], 0)
+        self.assertEqual(s.get(), "f")
+
+    def test_iter(self):
+        s = scheduler.Scheduler(self.graph)
+        order = []
+        for node in s:
+            order.append(node)
+            s.done(node)
+        self.assertEqual(order, ["e", self.cycle, "f", "b", "x", "a"])
+        self.assertEqual(len(s), 0)
+
+    def test_run(self):
+        lock = threading.Lock()
+        finished = set()
+
+        def work(node):
+            deps = set(self.graph.graph.successors(node))
+            with lock:
+                self.assertTrue(deps <= finished)
+                finished.add(node)
+            return self.graph.format(node)
+
+        s = scheduler.Scheduler(self.graph)
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            results = s.run(executor, work)
+        self.assertEqual(set(results), set(self.graph.graph.nodes))
+        self.assertEqual(results["a"], "a")
+
+    def test_run_error(self):
+        def work(node):
+            if node == "b":
+                raise ValueError(node)
+            return node
+
+        s = scheduler.Scheduler(self.graph)
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            with self.assertRaises(ValueError):
+                s.run(executor, work)
+
+    def test_get_after_error(self):
+        def work(node):
+            raise ValueError(node)
+
+        s = scheduler.Scheduler(self.graph)
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            with self.assertRaises(ValueError):
+                s.run(executor, work)
+        for _ in range(3):
+            self.assertIsNone(s.get(timeout=1))
+            self.assertIsNone(s.get(block=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""Tests for shard.py."""
+
+import os
+import subprocess
+import sys
+import unittest
+
+from importlab import graph
+from importlab import resolve
+from importlab import shard
+
+from tests import fixtures
+
+
+class TestShard(fixtures.SourceTreeTest):
+    """Tests for sharded graph construction."""
+
+    def setUp(self):
+        super(TestShard, self).setUp()
+        # The library files are dependencies, not source files.
+        self.filenames = [self.tempdir[f] for f in self.FILES
+                          if not f.startswith("lib/")]
+
+    def assertSameGraph(self, g1, g2):
+        def nodes(g):
+            return sorted(tuple(x) for x in g.sorted_source_files())
+        self.assertEqual(nodes(g1), nodes(g2))
+        self.assertEqual(sorted((str(k), sorted(map(str, v)))
+                                for k, v in g1.deps_list()),
+                         sorted((str(k), sorted(map(str, v)))
+                                for k, v in g2.deps_list()))
+        self.assertEqual(g1.get_all_unresolved(), g2.get_all_unresolved())
+        self.assertEqual(g1.unreadable_files, g2.unreadable_files)
+        self.assertEqual(g1.sources, g2.sources)
+        self.assertEqual(set(g1.provenance), set(g2.provenance))
+
+    def partials(self, num_shards):
+        return [shard.build_partial(
+                    self.env, shard.shard_files(self.filenames, num_shards, i))
+                for i in range(num_shards)]
+
+    def test_shard_files(self):
+        shards = [shard.shard_files(self.filenames, 3, i) for i in range(3)]
+        self.assertEqual(sorted(sum(shards, [])), sorted(self.filenames))
+        self.assertEqual(shards[1],
+                         shard.shard_files(reversed(self.filenames), 3, 1))
+        with self.assertRaises(shard.ShardError):
+            shard.shard_files(self.filenames, 3, 3)
+
+    def test_merge_matches_single_build(self):
+        single = graph.ImportGraph.create(self.env, self.filenames)
+        merged = shard.merge(self.env, self.partials(3))
+        self.assertSameGraph(single, merged)
+        cycles = [x for x, _ in merged.deps_list()
+                  if isinstance(x, graph.NodeSet)]
+        self.assertEqual(len(cycles), 1)
+
+    def test_merge_deterministic(self):
+        partials = self.partials(3)
+        g1 = shard.merge(self.env, partials)
+        g2 = shard.merge(self.env, list(reversed(partials)))
+        self.assertEqual([str(x) for x in g1.sorted_source_files()],
+                         [str(x) for x in g2.sorted_source_files()])
+
+    def test_merge_provenance_order_independent(self):
+        partials = self.partials(2)
+        dep = self.tempdir["lib/dep.py"]
+        partials[0]["provenance"][dep] = ["System", dep, "lib.dep", None]
+        partials[1]["provenance"][dep] = ["Local", dep, "lib.dep", 0]
+        for ps in (partials, list(reversed(partials))):
+            f = shard.merge(self.env, ps).provenance[dep]
+            self.assertTrue(isinstance(f, resolve.Local))
+
+    def test_merge_truncated(self):
+        budget = graph.CrawlBudget(max_depth=1)
+        qux, baz = self.tempdir["qux.py"], self.tempdir["baz.py"]
+        # qux.py only reaches baz.py at the depth limit, but the other shard
+        # reads it.
+        partials = [shard.build_partial(self.env, [qux], budget=budget),
+                    shard.build_partial(self.env, [baz], budget=budget)]
+        self.assertEqual(partials[0]["truncated"], [baz])
+        for ps in (partials, list(reversed(partials))):
+            g = shard.merge(self.env, ps)
+            self.assertEqual(g.truncated, {self.tempdir["bar.py"],
+                                           self.tempdir["foo/b.py"]})
+
+    def test_save_and_load(self):
+        partials = self.partials(2)
+        loaded = []
+        for i, partial in enumerate(partials):
+            path = self.tempdir["partial%d.json" % i]
+            shard.save_partial(partial, path)
+            loaded.append(shard.load_partial(path))
+        self.assertEqual(partials, loaded)
+        g = shard.merge(self.env, loaded)
+        f = g.provenance[self.tempdir["lib/dep.py"]]
+        self.assertTrue(isinstance(f, resolve.Local))
+        self.assertIs(f.fs, self.env.path[0])
+
+    def test_cli_save_partial_budget(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        path = self.tempdir["partial.json"]
+        subprocess.run(
+            [sys.executable, os.path.join(root, "bin", "importlab"),
+             "--save-partial", path, "--max-depth", "1",
+             "-P", self.tempdir.path, self.tempdir["qux.py"]],
+            cwd=self.tempdir.path, env=dict(os.environ, PYTHONPATH=root),
+            stdout=subprocess.DEVNULL, check=True)
+        partial = shard.load_partial(path)
+        self.assertEqual(partial["truncated"], [self.tempdir["baz.py"]])
+
+    def test_build_sharded(self):
+        single = graph.ImportGraph.create(self.env, self.filenames)
+        sharded = shard.build_sharded(self.env, self.filenames, 2)
+        self.assertSameGraph(single, sharded)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Startup import-time regression tests.
+
+These run a fresh interpreter with `python -X importtime` and check that
+heavy dependencies are not loaded until they are used.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported just to start up.
+HEAVY_MODULES = ('networkx', 'importlib.metadata', 'asyncio')
+
+
+def import_times(args):
+    """Run python -X importtime with args.
+
+    Returns:
+      A dict of imported module name to cumulative import time in us.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    p = subprocess.run([sys.executable, '-X', 'importtime'] + args,
+                       cwd=ROOT, env=env, stdout=subprocess.PIPE,
+                       stderr=subprocess.PIPE, universal_newlines=True)
+    out = {}
+    for line in p.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            out[name.strip()] = int(cumulative)
+    return out
+
+
+def is_imported(times, mod):
+    """Whether mod or any of its submodules was imported."""
+    return any(m == mod or m.startswith(mod + '.') for m in times)
+
+
+class TestStartup(unittest.TestCase):
+    """Tests that importing importlab does not pull in heavy dependencies."""
+
+    def assertImported(self, times, mod):
+        self.assertTrue(is_imported(times, mod), mod)
+
+    def assertNotImported(self, times):
+        self.assertTrue(times)
+        for mod in HEAVY_MODULES:
+            self.assertFalse(is_imported(times, mod), mod)
+
+    def test_import_library(self):
+        self.assertNotImported(import_times(
+            ['-c', 'import importlab.environment, importlab.graph, '
+             'importlab.output']))
+
+    def test_cli_nothing_to_do(self):
+        self.assertNotImported(import_times(
+            [os.path.join('bin', 'importlab')]))
+
+    def test_cli_version_on_stdout(self):
+        from importlib import metadata
+        try:
+            version = metadata.version('importlab')
+        except metadata.PackageNotFoundError:
+            self.skipTest('importlab is not installed')
+        p = subprocess.run(
+            [sys.executable, os.path.join('bin', 'importlab'), '--version'],
+            cwd=ROOT, env=dict(os.environ, PYTHONPATH=ROOT),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        self.assertEqual(p.returncode, 0)
+        self.assertEqual(p.stdout, version + '\n')
+        self.assertEqual(p.stderr, '')
+
+    def test_networkx_loaded_on_use(self):
+        times = import_times(
+            ['-c', 'from importlab import graph; graph.DependencyGraph()'])
+        self.assertImported(times, 'networkx')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""Tests for trace.py."""
+
+import json
+import os
+import sys
+import threading
+import unittest
+
+from importlab import environment
+from importlab import fs
+from importlab import graph
+from importlab import trace
+from importlab import utils
+
+
+class TestTracer(unittest.TestCase):
+    """Tests for Tracer."""
+
+    def test_span(self):
+        tracer = trace.Tracer()
+        with tracer.span("parse", "crawl", file="a.py"):
+            pass
+        (event,) = tracer.events
+        self.assertEqual(event["name"], "parse")
+        self.assertEqual(event["cat"], "crawl")
+        self.assertEqual(event["ph"], "X")
+        self.assertEqual(event["args"], {"file": "a.py"})
+        self.assertEqual(event["tid"], threading.get_ident())
+        self.assertGreaterEqual(event["ts"], 0)
+        self.assertGreaterEqual(event["dur"], 0)
+
+    def test_span_with_exception(self):
+        tracer = trace.Tracer()
+        with self.assertRaises(ValueError):
+            with tracer.span("parse", "crawl"):
+                raise ValueError()
+        self.assertEqual(len(tracer.events), 1)
+
+    def test_threads(self):
+        tracer = trace.Tracer()
+        # Keep every thread alive until all have recorded their span, so that
+        # thread ids are not reused.
+        barrier = threading.Barrier(3)
+
+        def work():
+            tracer.add_span("x", "y", 0, 1)
+            barrier.wait()
+
+        threads = [threading.Thread(target=work, name="worker-%d" % i)
+                   for i in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        data = tracer.to_json()
+        names = [e["args"]["name"] for e in data["traceEvents"]
+                 if e["ph"] == "M"]
+        self.assertEqual(sorted(names), ["worker-0", "worker-1", "worker-2"])
+        spans = [e for e in data["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual(len(spans), 3)
+        self.assertEqual(spans[0]["dur"], 1e6)
+
+    def test_save(self):
+        tracer = trace.Tracer()
+        with tracer.span("a", "b"):
+            pass
+        with utils.Tempdir() as d:
+            path = os.path.join(d.path, "trace.json")
+            tracer.save(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f), tracer.to_json())
+
+    def test_null_tracer(self):
+        tracer = trace.NullTracer()
+        with tracer.span("a", "b", c=1):
+            pass
+        tracer.add_span("a", "b", 0, 1)
+
+
+class TestImportGraphTrace(unittest.TestCase):
+    """Tests for the spans recorded while creating an ImportGraph."""
+
+    def test_create(self):
+        with utils.Tempdir() as d:
+            d.create_file("a.py", "import b")
+            d.create_file("b.py", "import a")
+            env = environment.Environment(
+                fs.Path([fs.OSFileSystem(d.path)]), sys.version_info[:2])
+            tracer = trace.Tracer()
+            graph.ImportGraph.create(env, [d["a.py"]], tracer=tracer)
+        spans = sorted((e["name"], e.get("args", {}).get("file"))
+                       for e in tracer.events)
+        self.assertEqual(spans, [
+            ("build", None),
+            ("crawl", None),
+            ("parse", d["a.py"]),
+            ("parse", d["b.py"]),
+            ("resolve", d["a.py"]),
+            ("resolve", d["b.py"]),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
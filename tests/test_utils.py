@@ -1,5 +1,6 @@
 """Tests for utils.py."""
 
+import os
 import sys
 import tempfile
 import unittest
@@ -26,6 +27,65 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(stdout.strip().decode(), 'test')
         self.assertFalse(stderr)
 
+    def test_expand_path_cwd(self):
+        with utils.Tempdir() as d:
+            d.create_file('foo/a.py')
+            self.assertEqual(utils.expand_path('foo/a.py', cwd=d.path),
+                             os.path.realpath(d['foo/a.py']))
+            self.assertEqual(utils.expand_path(d['foo/a.py'], cwd='/'),
+                             os.path.realpath(d['foo/a.py']))
+
+
+class TestExpandSourceFiles(unittest.TestCase):
+    """Tests for source file discovery."""
+
+    FILES = ['a.py', 'b.txt', 'foo/c.py', 'foo/bar/d.py',
+             '.git/e.py', 'node_modules/pkg/f.py', 'third_party/g.py']
+
+    def setUp(self):
+        self.tempdir = utils.Tempdir()
+        self.tempdir.setup()
+        for f in self.FILES:
+            self.tempdir.create_file(f)
+        self.root = os.path.realpath(self.tempdir.path)
+
+    def tearDown(self):
+        self.tempdir.teardown()
+
+    def expected(self, files):
+        return sorted(os.path.join(self.root, f) for f in files)
+
+    def test_expand(self):
+        out = utils.expand_source_files([self.root])
+        self.assertEqual(out, self.expected(
+            f for f in self.FILES if f.endswith('.py')))
+
+    def test_excludes_prune_subtrees(self):
+        excludes = ['.git', 'node_modules', 'third_party/*']
+        out = utils.expand_source_files([self.root], excludes=excludes)
+        self.assertEqual(
+            out, self.expected(['a.py', 'foo/c.py', 'foo/bar/d.py']))
+
+    def test_parallel(self):
+        serial = utils.expand_source_files([self.root])
+        parallel = utils.expand_source_files([self.root], jobs=4)
+        self.assertEqual(serial, parallel)
+
+    def test_symlinked_dirs_not_followed(self):
+        os.symlink(self.root, os.path.join(self.root, 'foo', 'loop'))
+        for jobs in (1, 4):
+            out = utils.expand_source_files([self.root], jobs=jobs)
+            self.assertEqual(out, self.expected(
+                f for f in self.FILES if f.endswith('.py')))
+
+    def test_iter_deduplicates(self):
+        out = list(utils.iter_source_files(
+            ['a.py', '.', 'foo/c.py', 'b.txt'], cwd=self.root))
+        self.assertEqual(len(out), len(set(out)))
+        self.assertEqual(out[0], os.path.join(self.root, 'a.py'))
+        self.assertEqual(sorted(out), self.expected(
+            f for f in self.FILES if f.endswith('.py')))
+
 
 if __name__ == "__main__":
     unittest.main()